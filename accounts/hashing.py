@@ -0,0 +1,93 @@
+"""
+Password hashing off the request thread, with back-pressure.
+
+Hashing runs on a bounded thread pool (hashlib's PBKDF2 and argon2-cffi
+release the GIL, so threads use every core). At most WORKERS + MAX_PENDING
+hashes may be running or queued; past that ``run``/``arun`` raise
+``HashingPoolFull`` at once and the views answer 429 instead of piling up
+requests behind the CPU.
+
+Pool threads only hash: database reads and writes stay on the request side.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, check_password, make_password
+
+
+class HashingPoolFull(Exception):
+    pass
+
+
+class HashingPool:
+
+    def __init__(self, workers, max_pending):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hashing")
+        self.slots = threading.BoundedSemaphore(workers + max_pending)
+
+    def submit(self, func, *args):
+        if not self.slots.acquire(blocking=False):
+            raise HashingPoolFull()
+        try:
+            future = self.executor.submit(func, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def run(self, func, *args):
+        """Run ``func(*args)`` on the pool and wait (sync views)"""
+        return self.submit(func, *args).result()
+
+    async def arun(self, func, *args):
+        """Run ``func(*args)`` on the pool without blocking the event loop"""
+        return await asyncio.wrap_future(self.submit(func, *args))
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_hashing_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                config = settings.PASSWORD_HASHING
+                _pool = HashingPool(config['WORKERS'], config['MAX_PENDING'])
+    return _pool
+
+
+def verify_password(password, encoded):
+    """
+    ``(valid, new_encoded)``. ``new_encoded`` is set when the stored hash uses
+    an older hasher or weaker parameters than PASSWORD_HASHERS[0]: save it
+    to rehash transparently on login.
+    """
+    rehashed = []
+    valid = check_password(password, encoded, setter=lambda raw: rehashed.append(make_password(raw)))
+    return valid, (rehashed[0] if rehashed else None)
+
+
+def hash_password(password):
+    """Also run for unknown emails, so response time does not reveal which emails exist"""
+    return make_password(password)
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2 with PASSWORD_ARGON2 parameters; hashes with other parameters are upgraded on login"""
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2['TIME_COST']
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2['MEMORY_COST']
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2['PARALLELISM']
@@ -5,13 +5,17 @@ import uuid
 
 
 class UserManager(BaseUserManager):
-    def create_user(self, email, full_name, password=None):
+    def create_user(self, email, full_name, password=None, password_hash=None):
+        """``password_hash``: an already hashed password (see accounts.hashing)"""
         if not email:
             raise ValueError('Users must have an email address')
         
         email = self.normalize_email(email)
         user = self.model(email=email, full_name=full_name)
-        user.set_password(password)
+        if password_hash is not None:
+            user.password = password_hash
+        else:
+            user.set_password(password)
         user.save(using=self._db)
         return user
     
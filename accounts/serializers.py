@@ -2,6 +2,8 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 
+from .hashing import get_hashing_pool, hash_password
+
 User = get_user_model()
 
 
@@ -19,11 +21,19 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return attrs
     
     def create(self, validated_data):
+        """
+        Hash on the hashing pool (accounts.hashing). Pass ``password_hash`` to
+        save() when it was computed already (async registration).
+        Raises HashingPoolFull.
+        """
         validated_data.pop('confirm_password')
+        password_hash = validated_data.pop('password_hash', None)
+        if password_hash is None:
+            password_hash = get_hashing_pool().run(hash_password, validated_data['password'])
         user = User.objects.create_user(
             email=validated_data['email'],
             full_name=validated_data['full_name'],
-            password=validated_data['password']
+            password_hash=password_hash
         )
         return user
 
@@ -37,4 +47,11 @@ class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('id', 'email', 'full_name', 'phone', 'date_joined')
-        read_only_fields = ('id', 'date_joined')
\ No newline at end of file
+        read_only_fields = ('id', 'date_joined')
+
+    def update(self, instance, validated_data):
+        # Only the edited columns: concurrent changes to is_active/password survive
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
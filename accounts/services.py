@@ -0,0 +1,65 @@
+from django.contrib.auth import get_user_model
+
+from .hashing import get_hashing_pool, hash_password, verify_password
+from .serializers import UserSerializer
+from .tokens import CachedBlacklistRefreshToken
+
+User = get_user_model()
+
+
+INVALID_CREDENTIALS = {'error': 'Invalid email or password'}
+HASHING_BUSY = {'error': 'Too many sign-in requests right now, please retry shortly'}
+# Seconds, sent as Retry-After with HASHING_BUSY
+HASHING_RETRY_AFTER = 1
+
+
+def auth_response(user, message):
+    """Body returned by login and registration: the user plus a fresh token pair"""
+    refresh = CachedBlacklistRefreshToken.for_user(user)
+    return {
+        'message': message,
+        'user': UserSerializer(user).data,
+        'tokens': {
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
+        }
+    }
+
+
+def _login_user(user, valid, new_hash):
+    if user is None or not valid or not user.is_active:
+        return None, False
+    if new_hash:
+        user.password = new_hash
+        return user, True
+    return user, False
+
+
+def authenticate_user(email, password):
+    """
+    What ``authenticate()`` with ModelBackend does, with the hash checked on
+    the hashing pool. Returns the active user or None; a hash made with an
+    older hasher or weaker parameters is replaced. Raises HashingPoolFull.
+    """
+    pool = get_hashing_pool()
+    user = User.objects.filter(email=email).first()
+    if user is None:
+        pool.run(hash_password, password)
+        return None
+    user, rehashed = _login_user(user, *pool.run(verify_password, password, user.password))
+    if rehashed:
+        user.save(update_fields=['password'])
+    return user
+
+
+async def aauthenticate_user(email, password):
+    """authenticate_user for async views"""
+    pool = get_hashing_pool()
+    user = await User.objects.filter(email=email).afirst()
+    if user is None:
+        await pool.arun(hash_password, password)
+        return None
+    user, rehashed = _login_user(user, *await pool.arun(verify_password, password, user.password))
+    if rehashed:
+        await user.asave(update_fields=['password'])
+    return user
@@ -0,0 +1,31 @@
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save
+
+from .authentication import invalidate_cached_user
+from .models import User
+from .tokens import blacklisted_jtis
+
+
+def drop_cached_user(sender, instance, **kwargs):
+    # Profile edits (UserProfileView, admin), is_active, password changes
+    invalidate_cached_user(instance.pk)
+
+
+def drop_cached_token_user(sender, instance, **kwargs):
+    # BlacklistedToken -> OutstandingToken -> user
+    invalidate_cached_user(instance.token.user_id)
+
+
+def remember_blacklisted_token(sender, instance, **kwargs):
+    blacklisted_jtis().add(instance.token.jti, instance.token.expires_at.timestamp())
+
+
+def connect():
+    post_save.connect(drop_cached_user, sender=User, dispatch_uid="accounts.drop_cached_user")
+    post_delete.connect(drop_cached_user, sender=User, dispatch_uid="accounts.drop_cached_user_delete")
+
+    if apps.is_installed("rest_framework_simplejwt.token_blacklist"):
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+        post_save.connect(drop_cached_token_user, sender=BlacklistedToken, dispatch_uid="accounts.drop_cached_token_user")
+        post_save.connect(remember_blacklisted_token, sender=BlacklistedToken, dispatch_uid="accounts.remember_blacklisted_token")
@@ -1,3 +1,234 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+from payments.models import Payment
+
+from .authentication import user_cache, user_cache_key
+from .hashing import HashingPool
+from .models import User
+from .throttling import MemoryBucketStore
+from .tokens import blacklisted_jtis
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    """The user is loaded once per cache TTL, and changes take effect at once"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='auth@yourkirana.in', full_name='Auth User', password='x')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+        self.addCleanup(user_cache().clear)
+
+    def user_queries(self, path):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(path)
+        return response, sum('FROM "accounts_user"' in q['sql'] for q in ctx.captured_queries)
+
+    def test_user_loaded_once(self):
+        self.assertEqual(self.user_queries('/api/auth/profile/')[1], 1)
+        response, queries = self.user_queries('/api/auth/profile/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, 0)
+
+    def test_profile_update_refreshes_cached_user(self):
+        self.client.get('/api/auth/profile/')
+        self.client.patch('/api/auth/profile/', {'full_name': 'Renamed'}, format='json')
+        self.assertEqual(self.client.get('/api/auth/profile/').json()['full_name'], 'Renamed')
+
+    def test_deactivated_user_rejected(self):
+        self.client.get('/api/auth/profile/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(user_cache().get(user_cache_key(self.user.pk)))
+        self.assertEqual(self.client.get('/api/auth/profile/').status_code, 401)
+
+    def test_profile_update_does_not_revive_user_deactivated_behind_cache(self):
+        self.client.get('/api/auth/profile/')
+        # .update() sends no post_save: the cached user still says is_active=True
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        response = self.client.patch('/api/auth/profile/', {'full_name': 'Renamed'}, format='json')
+
+        self.assertEqual(response.status_code, 401)
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.is_active, self.user.full_name), (False, 'Auth User'))
+        self.assertEqual(self.client.get('/api/auth/profile/').status_code, 401)
+
+    def test_profile_update_writes_only_edited_fields(self):
+        self.client.get('/api/auth/profile/')
+        User.objects.filter(pk=self.user.pk).update(phone='9999999999')
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.patch('/api/auth/profile/', {'full_name': 'Renamed'}, format='json')
+
+        update = next(q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "accounts_user"'))
+        self.assertNotIn('"password"', update)
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.full_name, self.user.phone), ('Renamed', '9999999999'))
+
+    def test_payment_reads_use_cached_user(self):
+        self.client.get('/api/auth/profile/')
+        response, queries = self.user_queries('/api/payment/history/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, 0)
+
+    def test_deactivated_user_loses_payment_reads(self):
+        payment = Payment.objects.create(
+            user=self.user, order_id='YKAUTH1', amount=Decimal('10'),
+            customer_name='A', customer_email='a@a.in', customer_phone='1',
+        )
+        for path in ('/api/payment/history/', f'/api/payment/status/{payment.order_id}/'):
+            self.assertEqual(self.client.get(path).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        for path in ('/api/payment/history/', f'/api/payment/status/{payment.order_id}/'):
+            self.assertEqual(self.client.get(path).status_code, 401)
+
+
+class PasswordHashingTests(TestCase):
+    """Login/registration hash on the bounded pool, answer 429 when it is full, and upgrade old hashes"""
+
+    PASSWORD = 'Hash-pool-pass-931'
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='hash@yourkirana.in', full_name='Hash User', password=self.PASSWORD)
+
+    def login(self, path='/api/auth/login/', password=PASSWORD):
+        return APIClient().post(path, {'email': self.user.email, 'password': password}, format='json')
+
+    def test_sync_and_async_login(self):
+        self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(self.login('/api/auth/login/async/').status_code, 200)
+        self.assertEqual(self.login('/api/auth/login/async/', password='wrong').status_code, 401)
+
+    def test_async_registration(self):
+        response = APIClient().post('/api/auth/register/async/', {
+            'email': 'new@yourkirana.in', 'full_name': 'New User',
+            'password': self.PASSWORD, 'confirm_password': self.PASSWORD,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(User.objects.get(email='new@yourkirana.in').check_password(self.PASSWORD))
+
+    def test_full_pool_answers_429(self):
+        release = threading.Event()
+        pool = HashingPool(workers=1, max_pending=0)
+        pool.submit(release.wait)
+        try:
+            with mock.patch('accounts.services.get_hashing_pool', return_value=pool):
+                response = self.login()
+        finally:
+            release.set()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+
+    def test_rehash_on_login(self):
+        argon2_first = ['accounts.hashing.TunedArgon2PasswordHasher', *settings.PASSWORD_HASHERS]
+        with override_settings(PASSWORD_HASHERS=argon2_first):
+            self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('argon2$'))
+
+
+class SignInThrottleTests(TestCase):
+    """Token buckets per IP and per email, checked before any query or hash"""
+
+    RATES = {'login_ip': '5/min', 'login_email': '2/min', 'register_ip': '1/min', 'register_email': '1/min'}
+
+    def setUp(self):
+        throttle = override_settings(AUTH_THROTTLE={**settings.AUTH_THROTTLE, 'RATES': self.RATES})
+        throttle.enable()
+        self.addCleanup(throttle.disable)
+
+    def login(self, email, path='/api/auth/login/', ip='203.0.113.1'):
+        return APIClient().post(path, {'email': email, 'password': 'x'}, format='json', REMOTE_ADDR=ip)
+
+    def test_per_email_bucket(self):
+        self.assertEqual(self.login('victim@yourkirana.in').status_code, 401)
+        self.assertEqual(self.login('Victim@yourkirana.in', ip='203.0.113.2').status_code, 401)
+        with self.assertNumQueries(0):
+            response = self.login('victim@yourkirana.in', ip='203.0.113.3')
+        self.assertEqual(response.status_code, 429)
+        # 30s per token, less the time the two hashed logins took
+        self.assertIn(response['Retry-After'], {'29', '30'})
+        self.assertEqual(self.login('other@yourkirana.in').status_code, 401)
+
+    def test_per_ip_bucket_async(self):
+        for i in range(5):
+            self.assertEqual(self.login(f'u{i}@yourkirana.in', path='/api/auth/login/async/').status_code, 401)
+        response = self.login('u5@yourkirana.in', path='/api/auth/login/async/')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(self.login('u5@yourkirana.in', path='/api/auth/login/async/', ip='203.0.113.9').status_code, 401)
+
+    def test_registration(self):
+        body = {'email': 'reg@yourkirana.in', 'full_name': 'Reg', 'password': 'x', 'confirm_password': 'y'}
+        self.assertEqual(APIClient().post('/api/auth/register/', body, format='json').status_code, 400)
+        self.assertEqual(APIClient().post('/api/auth/register/', body, format='json').status_code, 429)
+
+    def test_memory_store_refills_and_evicts(self):
+        store = MemoryBucketStore(MAX_KEYS=10)
+        with mock.patch('accounts.throttling.time.monotonic', return_value=100.0):
+            self.assertEqual([store.consume('k', 30, 30) for _ in range(3)], [0, 0, 30])
+        with mock.patch('accounts.throttling.time.monotonic', return_value=130.0):
+            self.assertEqual(store.consume('k', 30, 30), 0)
+            for i in range(20):
+                store.consume(f'ip{i}', 30, 30)
+        self.assertLessEqual(len(store), 10)
+
+
+class TokenBlacklistTests(TestCase):
+    """Refresh rotation and logout blacklist tokens; replays are refused from memory; expired rows are pruned"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='tokens@yourkirana.in', full_name='Token User', password='x')
+        self.refresh = str(RefreshToken.for_user(self.user))
+        self.addCleanup(blacklisted_jtis().clear)
+
+    def refresh_token(self, token):
+        return APIClient().post('/api/auth/token/refresh/', {'refresh': token}, format='json')
+
+    def test_rotation_blacklists_old_token(self):
+        response = self.refresh_token(self.refresh)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.json()['refresh'], self.refresh)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.refresh_token(self.refresh).status_code, 401)
+        self.assertEqual(self.refresh_token(response.json()['refresh']).status_code, 200)
+
+    def test_replay_seen_in_database_is_remembered(self):
+        RefreshToken(self.refresh).blacklist()
+        blacklisted_jtis().clear()
+        self.assertEqual(self.refresh_token(self.refresh).status_code, 401)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.refresh_token(self.refresh).status_code, 401)
+
+    def test_logout(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken(self.refresh).access_token}")
+        self.assertEqual(client.post('/api/auth/logout/', {'refresh_token': self.refresh}, format='json').status_code, 200)
+        self.assertEqual(self.refresh_token(self.refresh).status_code, 401)
+
+    def test_prune_tokens(self):
+        RefreshToken(self.refresh).blacklist()
+        live = RefreshToken.for_user(self.user)
+        live.blacklist()
+        OutstandingToken.objects.exclude(jti=live['jti']).update(expires_at=aware_utcnow() - timedelta(seconds=1))
+        for i in range(3):
+            OutstandingToken.objects.create(jti=f'old{i}', token='', expires_at=aware_utcnow() - timedelta(days=1))
+
+        out = StringIO()
+        call_command('prune_tokens', chunk_size=2, sleep=0, stdout=out)
+        self.assertIn('Deleted 4 expired token(s)', out.getvalue())
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), [live['jti']])
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
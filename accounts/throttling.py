@@ -0,0 +1,200 @@
+"""
+Token-bucket throttles for the sign-in endpoints.
+
+Each bucket holds RATE's N tokens and refills at N per period; a request
+takes one token. Buckets are kept in GCRA form: one number per key, the
+time at which the bucket will be full again ("theoretical arrival time").
+A key whose time has passed is a full bucket and can be forgotten.
+
+The throttles only read the client address and the submitted email, so a
+throttled request is refused before any database query or password hash.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'5/min' -> (5, 60), the same format as DRF's throttle rates"""
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+def gcra(tat, now, interval, tolerance):
+    """
+    ``(new_tat, retry_after)`` for one request: ``new_tat`` is None when
+    the request is refused, ``retry_after`` (seconds) is 0 when it is allowed.
+    """
+    tat = max(tat or now, now)
+    if tat - now > tolerance:
+        return None, tat - tolerance - now
+    return tat + interval, 0
+
+
+class MemoryBucketStore:
+    """
+    Buckets in a dict in this process (each worker counts on its own).
+
+    Keys are stored as their 64-bit ``hash()`` and values as a float, about
+    100 bytes per tracked key (see benchmarks/throttle_memory.py). Past
+    MAX_KEYS, full buckets are swept out, then the oldest keys; dropping a
+    key only resets its bucket.
+    """
+
+    def __init__(self, MAX_KEYS=1_000_000, **options):
+        self.max_keys = MAX_KEYS
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key, interval, tolerance):
+        """Take a token from ``key``'s bucket; returns seconds to wait, 0 if allowed"""
+        key = hash(key)
+        now = time.monotonic()
+        with self._lock:
+            tat, retry_after = gcra(self._buckets.get(key), now, interval, tolerance)
+            if tat is not None:
+                self._buckets[key] = tat
+                if len(self._buckets) > self.max_keys:
+                    self._evict(now)
+        return retry_after
+
+    def _evict(self, now):
+        self._buckets = {key: tat for key, tat in self._buckets.items() if tat > now}
+        excess = len(self._buckets) - self.max_keys * 9 // 10
+        if excess > 0:
+            # dicts keep insertion order: the first keys are the longest tracked
+            for key in list(self._buckets)[:excess]:
+                del self._buckets[key]
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBucketStore:
+    """
+    Buckets in a shared Django cache (Redis/Memcached), so every worker
+    counts against the same limit. The read-modify-write is not atomic:
+    concurrent requests for one key can each take the same token, letting
+    a burst slightly exceed the limit. Entries expire once the bucket is full.
+    """
+
+    def __init__(self, CACHE_ALIAS='default', **options):
+        self.cache_alias = CACHE_ALIAS
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def consume(self, key, interval, tolerance):
+        key = f"throttle:{key}"
+        now = time.time()
+        tat, retry_after = gcra(self.cache.get(key), now, interval, tolerance)
+        if tat is not None:
+            self.cache.set(key, tat, timeout=max(1, int(tat - now) + 1))
+        return retry_after
+
+    def clear(self):
+        self.cache.clear()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_bucket_store():
+    """The configured AUTH_THROTTLE store (one per process)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                config = settings.AUTH_THROTTLE
+                _store = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+    return _store
+
+
+def _reset_store(setting, **kwargs):
+    global _store
+    if setting == 'AUTH_THROTTLE':
+        _store = None
+
+
+setting_changed.connect(_reset_store)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    ``scope`` names the AUTH_THROTTLE['RATES'] entry; subclasses say what
+    the bucket key is. Works on DRF requests and, through ``check``, on the
+    parsed body of the plain async views.
+    """
+    scope = None
+
+    def get_key(self, request, data):
+        raise NotImplementedError
+
+    def check(self, request, data):
+        """Seconds to wait, 0 if the request may go ahead"""
+        rate = settings.AUTH_THROTTLE['RATES'].get(self.scope)
+        key = self.get_key(request, data)
+        if rate is None or not key:
+            return 0
+        num, period = parse_rate(rate)
+        interval = period / num
+        return get_bucket_store().consume(f"{self.scope}:{key}", interval, period - interval)
+
+    def allow_request(self, request, view):
+        self.retry_after = self.check(request, request.data)
+        return not self.retry_after
+
+    def wait(self):
+        return self.retry_after
+
+
+class IPThrottle(TokenBucketThrottle):
+
+    def get_key(self, request, data):
+        return self.get_ident(request)
+
+
+class EmailThrottle(TokenBucketThrottle):
+    """Per target account, whichever addresses the attempts come from"""
+
+    def get_key(self, request, data):
+        email = data.get('email') if hasattr(data, 'get') else None
+        return email.strip().lower() if isinstance(email, str) else None
+
+
+class LoginIPThrottle(IPThrottle):
+    scope = 'login_ip'
+
+
+class LoginEmailThrottle(EmailThrottle):
+    scope = 'login_email'
+
+
+class RegisterIPThrottle(IPThrottle):
+    scope = 'register_ip'
+
+
+class RegisterEmailThrottle(EmailThrottle):
+    scope = 'register_email'
+
+
+LOGIN_THROTTLES = [LoginIPThrottle, LoginEmailThrottle]
+REGISTER_THROTTLES = [RegisterIPThrottle, RegisterEmailThrottle]
+
+
+def throttle_wait(request, data, throttle_classes):
+    """For views outside DRF: the longest wait among ``throttle_classes``, 0 if none applies"""
+    return max((throttle().check(request, data) for throttle in throttle_classes), default=0)
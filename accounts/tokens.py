@@ -0,0 +1,89 @@
+"""
+Refresh tokens with an in-process front for the blacklist check.
+
+simplejwt checks every refresh token it decodes (refresh, logout) against
+the token_blacklist tables. A blacklisted jti stays blacklisted until it
+expires, so "blacklisted" answers are remembered in a bounded LRU and a
+replayed token is refused without a query. "Not blacklisted" is never
+cached: another worker may have blacklisted the token since.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+class BlacklistLRU:
+    """jti -> expiry (epoch seconds) of tokens known to be blacklisted"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, jti, expires_at):
+        with self._lock:
+            self._entries[jti] = expires_at
+            self._entries.move_to_end(jti)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __contains__(self, jti):
+        with self._lock:
+            expires_at = self._entries.get(jti)
+            if expires_at is None:
+                return False
+            if expires_at <= time.time():
+                # Expired tokens are refused by the exp check anyway
+                del self._entries[jti]
+                return False
+            self._entries.move_to_end(jti)
+            return True
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_blacklisted = None
+_blacklisted_lock = threading.Lock()
+
+
+def blacklisted_jtis():
+    global _blacklisted
+    if _blacklisted is None:
+        with _blacklisted_lock:
+            if _blacklisted is None:
+                _blacklisted = BlacklistLRU(settings.TOKEN_BLACKLIST_LRU_SIZE)
+    return _blacklisted
+
+
+class CachedBlacklistRefreshToken(RefreshToken):
+    """
+    RefreshToken that asks ``blacklisted_jtis()`` before the database.
+    Tokens blacklisted in this process are added by accounts.signals.
+    """
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        if jti in blacklisted_jtis():
+            raise TokenError(_("Token is blacklisted"))
+        try:
+            super().check_blacklist()
+        except TokenError:
+            blacklisted_jtis().add(jti, self.payload['exp'])
+            raise
+
+
+class CachedBlacklistTokenRefreshSerializer(TokenRefreshSerializer):
+    """SIMPLE_JWT['TOKEN_REFRESH_SERIALIZER'] for TokenRefreshView"""
+    token_class = CachedBlacklistRefreshToken
@@ -3,6 +3,8 @@ from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (
     UserRegistrationView,
     UserLoginView,
+    AsyncUserRegistrationView,
+    AsyncUserLoginView,
     UserProfileView,
     UserLogoutView
 )
@@ -11,7 +13,10 @@ from .views import (
 
 urlpatterns = [
     path('register/', UserRegistrationView.as_view(), name='register'),
+    path('register/async/', AsyncUserRegistrationView.as_view(), name='register_async'),
     path('login/', UserLoginView.as_view(), name='login'),
+    path('login/async/', AsyncUserLoginView.as_view(), name='login_async'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('logout/', UserLogoutView.as_view(), name='logout'),
     path('profile/', UserProfileView.as_view(), name='profile'),
 ]
\ No newline at end of file
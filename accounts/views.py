@@ -1,19 +1,38 @@
 from rest_framework import status, generics
+from rest_framework.exceptions import AuthenticationFailed, Throttled
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework_simplejwt.tokens import RefreshToken
-from django.contrib.auth import authenticate, get_user_model
+from rest_framework.permissions import SAFE_METHODS, AllowAny, IsAuthenticated
+from django.contrib.auth import get_user_model
 from django.core.mail import send_mail
 from django.conf import settings
 from django.utils import timezone
+from django.http import JsonResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from django.utils.decorators import method_decorator
+from asgiref.sync import sync_to_async
 from datetime import timedelta
+import json
+import math
 
+from .authentication import invalidate_cached_user
+from .hashing import HashingPoolFull, get_hashing_pool, hash_password
+from .tokens import CachedBlacklistRefreshToken
+from .throttling import LOGIN_THROTTLES, REGISTER_THROTTLES, throttle_wait
 from .serializers import (
     UserRegistrationSerializer,
     UserLoginSerializer,
     UserSerializer,
 )
+from .services import (
+    HASHING_BUSY,
+    HASHING_RETRY_AFTER,
+    INVALID_CREDENTIALS,
+    aauthenticate_user,
+    auth_response,
+    authenticate_user,
+)
 
 User = get_user_model()
 
@@ -21,27 +40,24 @@ User = get_user_model()
 
 class UserRegistrationView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = REGISTER_THROTTLES
     
     def post(self, request):
         serializer = UserRegistrationSerializer(data=request.data)
         if serializer.is_valid():
-            user = serializer.save()
-            refresh = RefreshToken.for_user(user)
+            try:
+                user = serializer.save()
+            except HashingPoolFull:
+                return busy_response(Response)
             
-            return Response({
-                'message': 'User registered successfully',
-                'user': UserSerializer(user).data,
-                'tokens': {
-                    'refresh': str(refresh),
-                    'access': str(refresh.access_token),
-                }
-            }, status=status.HTTP_201_CREATED)
+            return Response(auth_response(user, 'User registered successfully'), status=status.HTTP_201_CREATED)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 class UserLoginView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = LOGIN_THROTTLES
     
     def post(self, request):
         serializer = UserLoginSerializer(data=request.data)
@@ -49,33 +65,122 @@ class UserLoginView(APIView):
             email = serializer.validated_data['email']
             password = serializer.validated_data['password']
             
-            user = authenticate(request, username=email, password=password)
+            try:
+                user = authenticate_user(email, password)
+            except HashingPoolFull:
+                return busy_response(Response)
             
             if user is not None:
-                refresh = RefreshToken.for_user(user)
-                
-                return Response({
-                    'message': 'Login successful',
-                    'user': UserSerializer(user).data,
-                    'tokens': {
-                        'refresh': str(refresh),
-                        'access': str(refresh.access_token),
-                    }
-                }, status=status.HTTP_200_OK)
+                return Response(auth_response(user, 'Login successful'), status=status.HTTP_200_OK)
             
-            return Response({
-                'error': 'Invalid email or password'
-            }, status=status.HTTP_401_UNAUTHORIZED)
+            return Response(INVALID_CREDENTIALS, status=status.HTTP_401_UNAUTHORIZED)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+def busy_response(response_class):
+    """429 for a full hashing pool; ``response_class`` is DRF Response or JsonResponse"""
+    return response_class(
+        HASHING_BUSY,
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={'Retry-After': str(HASHING_RETRY_AFTER)},
+    )
+
+
+def throttled_response(wait):
+    """What DRF answers for a throttled request, for the plain async views"""
+    return JsonResponse(
+        {'detail': Throttled(wait).detail},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={'Retry-After': str(math.ceil(wait))},
+    )
+
+
+def json_body(request):
+    """Parsed JSON object body, or None"""
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncUserRegistrationView(View):
+    """
+    UserRegistrationView for the ASGI deployment: the password is hashed on
+    the hashing pool while the event loop keeps serving other requests.
+    """
+
+    async def post(self, request):
+        data = json_body(request)
+        if data is None:
+            return JsonResponse({"detail": "JSON parse error"}, status=status.HTTP_400_BAD_REQUEST)
+
+        wait = throttle_wait(request, data, REGISTER_THROTTLES)
+        if wait:
+            return throttled_response(wait)
+
+        serializer = UserRegistrationSerializer(data=data)
+        # Unique-email check queries the database
+        if not await sync_to_async(serializer.is_valid)():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            password_hash = await get_hashing_pool().arun(hash_password, serializer.validated_data['password'])
+        except HashingPoolFull:
+            return busy_response(JsonResponse)
+
+        user = await sync_to_async(serializer.save)(password_hash=password_hash)
+        body = await sync_to_async(auth_response)(user, 'User registered successfully')
+        return JsonResponse(body, status=status.HTTP_201_CREATED)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncUserLoginView(View):
+    """UserLoginView for the ASGI deployment (see AsyncUserRegistrationView)"""
+
+    async def post(self, request):
+        data = json_body(request)
+        if data is None:
+            return JsonResponse({"detail": "JSON parse error"}, status=status.HTTP_400_BAD_REQUEST)
+
+        wait = throttle_wait(request, data, LOGIN_THROTTLES)
+        if wait:
+            return throttled_response(wait)
+
+        serializer = UserLoginSerializer(data=data)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            user = await aauthenticate_user(
+                serializer.validated_data['email'],
+                serializer.validated_data['password'],
+            )
+        except HashingPoolFull:
+            return busy_response(JsonResponse)
+
+        if user is None:
+            return JsonResponse(INVALID_CREDENTIALS, status=status.HTTP_401_UNAUTHORIZED)
+
+        body = await sync_to_async(auth_response)(user, 'Login successful')
+        return JsonResponse(body, status=status.HTTP_200_OK)
+
+
 class UserProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = UserSerializer
     
     def get_object(self):
-        return self.request.user
+        if self.request.method in SAFE_METHODS:
+            return self.request.user
+        # request.user may come from the auth cache: edit the current row, not a stale copy
+        try:
+            return User.objects.get(pk=self.request.user.pk, is_active=True)
+        except User.DoesNotExist:
+            invalidate_cached_user(self.request.user.pk)
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
 
 
 class UserLogoutView(APIView):
@@ -84,7 +189,7 @@ class UserLogoutView(APIView):
     def post(self, request):
         try:
             refresh_token = request.data.get('refresh_token')
-            token = RefreshToken(refresh_token)
+            token = CachedBlacklistRefreshToken(refresh_token)
             token.blacklist()
             
             return Response({
@@ -0,0 +1,12 @@
+"""
+Stand-alone performance benchmarks.
+
+Each module runs against a throwaway test database::
+
+    python -m benchmarks.webhook_queries
+
+``bench_*.py`` form the pytest-benchmark suite (see conftest.py)::
+
+    pip install -r requirements-dev.txt
+    pytest
+"""
@@ -0,0 +1,34 @@
+"""Login and registration; both are dominated by password hashing"""
+from benchmarks.harness import unique
+
+PASSWORD = "bench-pass-123"
+
+
+def test_login(benchmark, client, user, assert_queries):
+    credentials = {"email": user.email, "password": PASSWORD}
+
+    def login():
+        response = client.post("/api/auth/login/", credentials, format="json")
+        assert response.status_code == 200
+
+    # user lookup, INSERT outstanding refresh token (token_blacklist);
+    # the view issues tokens without touching last_login
+    assert_queries(2, login)
+    benchmark.pedantic(login, rounds=10)
+
+
+def test_register(benchmark, client, db, assert_queries):
+    password = "Bench-register-931"
+
+    def setup():
+        email = f"{unique('register')}@yourkirana.in"
+        body = {"email": email, "full_name": "Bench User", "password": password, "confirm_password": password}
+        return (body,), {}
+
+    def register(body):
+        response = client.post("/api/auth/register/", body, format="json")
+        assert response.status_code == 201
+
+    # unique email check, INSERT user, INSERT outstanding refresh token
+    assert_queries(3, register, *setup()[0])
+    benchmark.pedantic(register, setup=setup, rounds=10)
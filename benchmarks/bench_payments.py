@@ -0,0 +1,131 @@
+"""Payment endpoints and the PayG payload builder"""
+import pytest
+from django.utils import timezone
+
+from benchmarks.harness import unique
+from payments.models import Payment
+from payments.utils import PayGPayloadBuilder
+
+WEBHOOK_URL = "/api/payment/webhook/"
+
+
+class FakeGateway:
+    """Instant successful PayG order create, so only our side is measured"""
+
+    def create_payment_request(self, payment_data):
+        order_key_id = unique("BENCHPAYG")
+        return {
+            "success": True,
+            "data": {"OrderKeyId": order_key_id, "PaymentProcessUrl": f"https://payg.test/{order_key_id}"},
+        }
+
+
+def pending_payment(user, **fields):
+    payg_order_id = unique("PAYG")
+    return Payment.objects.create(
+        user=user,
+        order_id=unique("YKBENCH"),
+        amount=100,
+        customer_name=user.full_name,
+        customer_email=user.email,
+        customer_phone="9999999999",
+        payg_order_id=payg_order_id,
+        **fields,
+    )
+
+
+def webhook_body(payg_order_id):
+    return {
+        "OrderKeyId": payg_order_id,
+        "PaymentStatus": 1,
+        "PaymentResponseText": "Approved",
+        "PaymentMethod": "UPI",
+        "PaymentTransactionId": f"TXN{payg_order_id}",
+    }
+
+
+def test_initiate_payment(benchmark, auth_client, assert_queries, monkeypatch):
+    monkeypatch.setattr("payments.views.get_payment_gateway", FakeGateway)
+
+    def initiate():
+        response = auth_client.post("/api/payment/initiate/", {"amount": "499.00"}, format="json")
+        assert response.status_code == 200
+        return response
+
+    # user lookup (JWT), INSERT pending payment, UPDATE with the PayG order
+    assert_queries(3, initiate)
+    benchmark(initiate)
+
+
+def test_webhook_success(benchmark, client, user, assert_queries):
+
+    def setup():
+        return (webhook_body(pending_payment(user).payg_order_id),), {}
+
+    def deliver(body):
+        response = client.post(WEBHOOK_URL, body, format="json")
+        assert response.json()["status"] == "SUCCESS"
+
+    # SELECT ... FOR UPDATE, UPDATE payment, INSERT log
+    assert_queries(3, deliver, *setup()[0])
+    benchmark.pedantic(deliver, setup=setup, rounds=200)
+
+
+def test_webhook_duplicate(benchmark, client, user, assert_queries):
+    payment = pending_payment(user, status="SUCCESS", payment_completed_at=timezone.now())
+    body = webhook_body(payment.payg_order_id)
+
+    def deliver():
+        response = client.post(WEBHOOK_URL, body, format="json")
+        assert response.json()["message"] == "Already processed"
+
+    # SELECT ... FOR UPDATE, INSERT log
+    assert_queries(2, deliver)
+    benchmark(deliver)
+
+
+def test_webhook_unknown_order(benchmark, client, db, assert_queries):
+    body = webhook_body("PAYG-UNKNOWN")
+
+    def deliver():
+        assert client.post(WEBHOOK_URL, body, format="json").status_code == 404
+
+    # SELECT ... FOR UPDATE, INSERT log
+    assert_queries(2, deliver)
+    benchmark(deliver)
+
+
+@pytest.mark.parametrize("history_size", [10, 100, 1000])
+def test_payment_history(benchmark, auth_client, user, assert_queries, history_size):
+    Payment.objects.bulk_create([
+        Payment(
+            user=user, order_id=f"YKHIST{history_size}-{n}", amount=100, status="SUCCESS",
+            customer_name=user.full_name, customer_email=user.email, customer_phone="9999999999",
+        )
+        for n in range(history_size)
+    ])
+
+    def first_page():
+        response = auth_client.get("/api/payment/history/")
+        assert response.status_code == 200
+        return response
+
+    # one keyset page, independent of history size (the user comes from the auth cache)
+    first_page()
+    assert_queries(1, first_page)
+    benchmark(first_page)
+
+
+def test_payload_builder(benchmark):
+    builder = PayGPayloadBuilder("MID", "auth-key", "auth-token")
+    payment_data = {
+        "order_id": "YKBENCH",
+        "amount": 499.0,
+        "customer_name": "Bench User",
+        "customer_email": "bench@yourkirana.in",
+        "customer_phone": "9999999999",
+        "user_id": "1",
+        "callback_url": "https://yourkirana.in/cart",
+        "return_url": "https://yourkirana.in/cart",
+    }
+    benchmark(builder.build, payment_data)
@@ -0,0 +1,65 @@
+"""
+pytest-benchmark suite (``bench_*.py``). Each benchmark also pins the number
+of queries its code path issues, so an N+1 fails even on a noisy machine.
+
+    pytest                                   # run, compared with the latest baseline
+    pytest --benchmark-compare-fail=median:15%
+                                             # CI: fail if any median is >15% slower
+    pytest --benchmark-save=baseline         # store a new JSON baseline in benchmarks/baselines/
+    pytest --benchmark-disable               # run each benchmark once, no timing
+
+Baselines are per machine (pytest-benchmark files them under the machine
+id, e.g. ``Linux-CPython-3.11-64bit``); the committed one only holds on a runner
+like the one that saved it, so re-save it there after an intended change.
+``--benchmark-compare-fail`` is a usage error when no baseline matches, which
+is why it is not in pytest.ini's addopts.
+"""
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from benchmarks.harness import make_user
+
+
+@pytest.fixture(autouse=True)
+def unthrottled(settings):
+    """Benchmarks repeat one request from one address; keep the throttles (and their cost) but never trip them"""
+    settings.AUTH_THROTTLE = {
+        **settings.AUTH_THROTTLE,
+        'RATES': {scope: '1000000/s' for scope in settings.AUTH_THROTTLE['RATES']},
+    }
+
+
+@pytest.fixture
+def user(db):
+    return make_user()
+
+
+@pytest.fixture
+def client():
+    return APIClient()
+
+
+@pytest.fixture
+def auth_client(user):
+    """APIClient with a real JWT, so authentication cost is part of the number"""
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+    return client
+
+
+@pytest.fixture
+def assert_queries():
+    """``assert_queries(n, func, *args)``: call once, check it ran exactly ``n`` queries, return the result"""
+
+    def check(expected, func, *args, **kwargs):
+        with CaptureQueriesContext(connection) as ctx:
+            result = func(*args, **kwargs)
+        # Savepoints are transaction plumbing, not work
+        executed = [q["sql"] for q in ctx.captured_queries if "SAVEPOINT" not in q["sql"]]
+        assert len(executed) == expected, "\n".join(executed)
+        return result
+
+    return check
@@ -0,0 +1,109 @@
+"""
+Concurrent write throughput per DB_PROFILE.
+
+Each thread runs the checkout write pattern (create a PENDING payment, then
+apply its success webhook) against a fresh database. Every profile runs in
+its own subprocess, since settings are fixed at startup. SQLite profiles use
+a temporary file; postgres is included only when DB_HOST is set, and is
+migrated and written to as-is, so point DB_NAME at a scratch database.
+
+    python -m benchmarks.db_write_concurrency [--threads 8] [--iterations 50]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+PROFILES = ("sqlite", "sqlite-wal", "postgres")
+
+
+def run_profile(threads, iterations):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "yourkirana.settings")
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    from django.db import connections
+
+    from accounts.models import User
+    from payments.models import Payment, PaymentWebhookLog
+    from payments.services import process_webhook
+
+    call_command("migrate", verbosity=0)
+    user, _ = User.objects.get_or_create(email="bench@yourkirana.in", defaults={"full_name": "Bench User"})
+    connections.close_all()
+
+    errors = []
+    barrier = threading.Barrier(threads)
+
+    def worker(n):
+        barrier.wait()
+        try:
+            for i in range(iterations):
+                key = f"{os.getpid()}-{n}-{i}"
+                try:
+                    Payment.objects.create(
+                        user=user,
+                        order_id=f"YKDB{key}",
+                        amount=100,
+                        customer_name="Bench User",
+                        customer_email="bench@yourkirana.in",
+                        customer_phone="9999999999",
+                        payg_order_id=f"PAYG{key}",
+                    )
+                    process_webhook(PaymentWebhookLog(
+                        webhook_data={"OrderKeyId": f"PAYG{key}", "PaymentStatus": 1},
+                        order_key_id=f"PAYG{key}",
+                    ))
+                except Exception as e:
+                    errors.append(type(e).__name__)
+        finally:
+            connections.close_all()
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    checkouts = threads * iterations - len(errors)
+    print(f"RESULT\t{os.environ['DB_PROFILE']}\t{checkouts / elapsed:.0f}\t{len(errors)}\t{elapsed:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--profile", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:
+        run_profile(args.threads, args.iterations)
+        return
+
+    from benchmarks.harness import print_table
+
+    rows = []
+    for profile in PROFILES:
+        if profile == "postgres" and not os.getenv("DB_HOST"):
+            continue
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, DB_PROFILE=profile, SQLITE_PATH=os.path.join(tmp, "bench.sqlite3"),
+                       LOG_LEVEL="ERROR")
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.db_write_concurrency", "--profile", profile,
+                 "--threads", str(args.threads), "--iterations", str(args.iterations)],
+                env=env, capture_output=True, text=True, check=True,
+            ).stdout
+        result = next(line for line in output.splitlines() if line.startswith("RESULT\t"))
+        rows.append(result.split("\t")[1:])
+    print_table(("profile", "checkouts/s", "errors", "seconds"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import itertools
+import os
+import statistics
+import time
+
+
+def setup_django():
+    """Configure Django and switch the default alias to a fresh test database"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yourkirana.settings')
+
+    import django
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+
+_counter = itertools.count()
+
+
+def unique(prefix):
+    """``prefix`` plus a per-process sequence number"""
+    return f'{prefix}{next(_counter)}'
+
+
+def make_user(email='bench@yourkirana.in', full_name='Bench User'):
+    from accounts.models import User
+
+    user = User.objects.filter(email=email).first()
+    if user is None:
+        user = User.objects.create_user(email=email, full_name=full_name, password='bench-pass-123')
+    return user
+
+
+def timeit(func, repeat=5, number=1):
+    """Best-of-``repeat`` and median seconds per call of ``func``"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - started) / number)
+    return min(samples), statistics.median(samples)
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(x)) for x in column) for column in zip(headers, *rows)]
+    for row in [headers, *rows]:
+        print('  '.join(str(cell).ljust(width) for cell, width in zip(row, widths)))
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    """``{point: value}`` for the given percentiles of ``samples`` (inclusive method)"""
+    if not samples:
+        return dict.fromkeys(points, float('nan'))
+    if len(samples) == 1:
+        return dict.fromkeys(points, samples[0])
+    cuts = statistics.quantiles(samples, n=100, method='inclusive')
+    return {point: cuts[point - 1] for point in points}
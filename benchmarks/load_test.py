@@ -0,0 +1,173 @@
+"""
+End-to-end checkout load test against a running server.
+
+Starts one flow per 1/--rps seconds (open loop, so a slow server builds up
+in-flight flows instead of quietly lowering the load) for --duration
+seconds. Each flow runs register -> login -> initiate, then polls status
+until the PayG webhook settles the payment. Reports p50/p95/p99 latency and
+error counts per step; "settle" is initiate response -> settled status.
+
+    manage.py payg_simulator &
+    PAYG_BASE_URL=http://127.0.0.1:8765 AUTH_THROTTLE_REGISTER_IP=100000/hour manage.py runserver &
+    python -m benchmarks.load_test --rps 5 --duration 30 --max-p95-ms 800
+
+--simulator runs the PayG stand-in in this process instead. With
+--max-p95-ms / --max-error-rate the exit status is non-zero when a step is
+over budget, so the run can gate a performance change. Every flow
+registers from the same address, so raise the server's register_ip
+throttle as above or the run measures 429s.
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from collections import defaultdict
+
+import httpx
+
+from benchmarks.harness import percentiles, print_table
+
+STEPS = ("register", "login", "initiate", "settle", "status")
+PASSWORD = "Load-test-pass-931"
+SETTLED = ("SUCCESS", "FAILED")
+
+
+class Recorder:
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def ok(self, step, seconds):
+        self.samples[step].append(seconds * 1000)
+
+    def error(self, step):
+        self.errors[step] += 1
+
+    async def call(self, step, request):
+        """Await ``request``; record its latency, or an error for non-2xx/transport failures"""
+        started = time.perf_counter()
+        try:
+            response = await request
+        except httpx.HTTPError:
+            self.error(step)
+            return None
+        if response.status_code >= 400:
+            self.error(step)
+            return None
+        self.ok(step, time.perf_counter() - started)
+        return response
+
+    def rows(self):
+        for step in STEPS:
+            samples = self.samples[step]
+            p = percentiles(samples)
+            yield (step, len(samples), self.errors[step], f"{p[50]:.0f}", f"{p[95]:.0f}", f"{p[99]:.0f}")
+
+
+async def flow(client, recorder, args):
+    email = f"load-{uuid.uuid4().hex[:12]}@yourkirana.in"
+    registered = await recorder.call("register", client.post("/api/auth/register/", json={
+        "email": email, "full_name": "Load Test", "password": PASSWORD, "confirm_password": PASSWORD,
+    }))
+    if registered is None:
+        return
+
+    logged_in = await recorder.call("login", client.post("/api/auth/login/", json={
+        "email": email, "password": PASSWORD,
+    }))
+    if logged_in is None:
+        return
+    headers = {"Authorization": f"Bearer {logged_in.json()['tokens']['access']}"}
+
+    initiated = await recorder.call("initiate", client.post(
+        "/api/payment/initiate/", json={"amount": "499.00"}, headers=headers,
+    ))
+    if initiated is None:
+        return
+    order_id = initiated.json()["order_id"]
+
+    settle_started = time.perf_counter()
+    deadline = settle_started + args.settle_timeout
+    while time.perf_counter() < deadline:
+        response = await recorder.call("status", client.get(f"/api/payment/status/{order_id}/", headers=headers))
+        if response is not None and response.json()["payment"]["status"] in SETTLED:
+            recorder.ok("settle", time.perf_counter() - settle_started)
+            return
+        await asyncio.sleep(args.poll_interval)
+    recorder.error("settle")
+
+
+async def run(args):
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30) as client:
+        flows = []
+        started = time.perf_counter()
+        for n in range(int(args.rps * args.duration)):
+            await asyncio.sleep(max(0.0, started + n / args.rps - time.perf_counter()))
+            flows.append(asyncio.create_task(flow(client, recorder, args)))
+        await asyncio.gather(*flows)
+        elapsed = time.perf_counter() - started
+    return recorder, len(flows), elapsed
+
+
+def gate(recorder, args):
+    """Steps over the --max-p95-ms / --max-error-rate budget"""
+    failures = []
+    for step in STEPS:
+        samples, errors = recorder.samples[step], recorder.errors[step]
+        total = len(samples) + errors
+        if not total:
+            continue
+        if args.max_p95_ms is not None and samples and percentiles(samples)[95] > args.max_p95_ms:
+            failures.append(f"{step}: p95 over {args.max_p95_ms:.0f}ms")
+        if args.max_error_rate is not None and errors / total > args.max_error_rate:
+            failures.append(f"{step}: error rate {errors / total:.1%} over {args.max_error_rate:.1%}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--rps", type=float, default=5, help="New checkout flows per second")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--settle-timeout", type=float, default=15)
+    parser.add_argument("--poll-interval", type=float, default=0.25)
+    parser.add_argument("--max-connections", type=int, default=100)
+    parser.add_argument("--max-p95-ms", type=float, default=None)
+    parser.add_argument("--max-error-rate", type=float, default=None)
+    parser.add_argument("--simulator", action="store_true",
+                        help="Run the PayG simulator in-process (server needs PAYG_BASE_URL pointing at it)")
+    parser.add_argument("--simulator-port", type=int, default=8765)
+    args = parser.parse_args()
+
+    simulator = None
+    if args.simulator:
+        from payments.simulator import PayGSimulator
+
+        simulator = PayGSimulator(
+            port=args.simulator_port,
+            webhook_url=f"{args.base_url}/api/payment/webhook/",
+        ).start()
+
+    try:
+        recorder, flows, elapsed = asyncio.run(run(args))
+    finally:
+        if simulator is not None:
+            simulator.stop()
+
+    print(f"{flows} flows in {elapsed:.1f}s ({flows / elapsed:.1f} flows/s)")
+    print_table(("step", "ok", "errors", "p50 ms", "p95 ms", "p99 ms"), list(recorder.rows()))
+    if simulator is not None:
+        print(" ".join(f"{key}={value}" for key, value in simulator.stats.items()))
+
+    failures = gate(recorder, args)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
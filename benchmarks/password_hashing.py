@@ -0,0 +1,77 @@
+"""
+Password checks per second (the CPU cost of one login), per hasher profile:
+on one thread, and on the hashing pool sized to every core.
+
+    python -m benchmarks.password_hashing [--seconds 5]
+
+"per core" is the pool rate divided by os.cpu_count(); it is close to the
+single-thread rate when the hasher releases the GIL, as PBKDF2 (hashlib)
+and Argon2 (argon2-cffi) do.
+"""
+import argparse
+import os
+import time
+
+from benchmarks.harness import print_table
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "yourkirana.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.hashers import get_hasher  # noqa: E402
+
+from accounts.hashing import HashingPool, verify_password  # noqa: E402
+
+PROFILES = {
+    "pbkdf2": "pbkdf2_sha256",
+    "argon2": "argon2",
+}
+PASSWORD = "Bench-login-pass-931"
+
+
+def checks_per_second(encoded, seconds, pool=None, in_flight=1):
+    """Run password checks for ``seconds``, keeping ``in_flight`` of them submitted"""
+    done = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    if pool is None:
+        while time.perf_counter() < deadline:
+            verify_password(PASSWORD, encoded)
+            done += 1
+    else:
+        futures = [pool.submit(verify_password, PASSWORD, encoded) for _ in range(in_flight)]
+        while futures:
+            futures.pop(0).result()
+            done += 1
+            if time.perf_counter() < deadline:
+                futures.append(pool.submit(verify_password, PASSWORD, encoded))
+    return done / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    pool = HashingPool(workers=cores, max_pending=cores)
+    rows = []
+    for profile, algorithm in PROFILES.items():
+        try:
+            encoded = get_hasher(algorithm).encode(PASSWORD, get_hasher(algorithm).salt())
+        except ValueError as e:
+            # argon2-cffi not installed
+            print(f"skipping {profile}: {e}")
+            continue
+        single = checks_per_second(encoded, args.seconds)
+        pooled = checks_per_second(encoded, args.seconds, pool=pool, in_flight=cores)
+        rows.append((profile, f"{1000 / single:.0f}", f"{single:.1f}", f"{pooled:.1f}", f"{pooled / cores:.1f}"))
+
+    print(f"{cores} core(s)")
+    print_table(("profile", "ms/login", "logins/s 1 thread", f"logins/s pool({cores})", "logins/s/core"), rows)
+
+
+if __name__ == "__main__":
+    main()
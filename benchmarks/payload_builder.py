@@ -0,0 +1,86 @@
+"""
+PayG order payload building + serialization throughput: the original
+per-call construction versus PayGPayloadBuilder.
+
+    python -m benchmarks.payload_builder
+"""
+import base64
+import json
+from datetime import datetime
+
+from benchmarks.harness import print_table, timeit
+from payments.utils import PayGPayloadBuilder, json_dumps, orjson
+
+MID, AUTH_KEY, AUTH_TOKEN = "MID123", "0xKEY", "TOKEN"
+N = 20000
+
+PAYMENT_DATA = {
+    "order_id": "YK0123456789AB",
+    "amount": 1499.0,
+    "customer_name": "Asha Rani Kumar",
+    "customer_email": "asha@example.com",
+    "customer_phone": "9876543210",
+    "user_id": "5f0c7f9e-93a1-4c1e-9a57-6b8e2d3f4a10",
+    "callback_url": "https://yourkirana.in/cart",
+    "return_url": "https://yourkirana.in/cart",
+}
+
+
+def legacy_build(payment_data):
+    """The original create_payment_request payload, headers and body encoding"""
+    current_datetime = datetime.now().strftime('%Y%m%d')
+    payload = {
+        "MID": MID,
+        "UniqueRequestId": payment_data['order_id'],
+        "ProductData": json.dumps({
+            "ProductName": "YourKirana Order",
+            "ProductInfo": f"Order {payment_data['order_id']}",
+            "ProductPrice": str(payment_data['amount'])
+        }),
+        "RequestDateTime": current_datetime,
+        "RedirectUrl": payment_data['return_url'],
+        "TransactionData": {
+            "AcceptedPaymentTypes": "", "PaymentType": "", "SurchargeType": "", "SurchargeValue": "",
+            "RefTransactionId": "", "IndustrySpecificationCode": "", "PartialPaymentOption": ""
+        },
+        "OrderAmount": str(payment_data['amount']),
+        "OrderType": "ONLINE",
+        "OrderAmountData": {"AmountTypeDesc": "", "Amount": ""},
+        "CustomerData": {
+            "CustomerId": str(payment_data.get('user_id', '')),
+            "CustomerNotes": "Order from YourKirana",
+            "FirstName": payment_data['customer_name'].split()[0] if payment_data['customer_name'] else '',
+            "LastName": ' '.join(payment_data['customer_name'].split()[1:]) if len(payment_data['customer_name'].split()) > 1 else '',
+            "MobileNo": payment_data['customer_phone'],
+            "Email": payment_data['customer_email'],
+            "EmailReceipt": "true",
+            "BillingAddress": "", "BillingCity": "", "BillingState": "", "BillingCountry": "India", "BillingZipCode": "",
+            "ShippingFirstName": payment_data['customer_name'].split()[0] if payment_data['customer_name'] else '',
+            "ShippingLastName": ' '.join(payment_data['customer_name'].split()[1:]) if len(payment_data['customer_name'].split()) > 1 else '',
+            "ShippingAddress": "", "ShippingCity": "", "ShippingState": "", "ShippingCountry": "India", "ShippingZipCode": "",
+            "ShippingMobileNo": payment_data['customer_phone'],
+            "ShippingEmail": payment_data['customer_email']
+        }
+    }
+    auth = base64.b64encode(f"{AUTH_KEY}:{AUTH_TOKEN}:M:{MID}".encode()).decode()
+    headers = {'Content-Type': 'application/json', 'Authorization': f"basic {auth}", 'cache-control': 'no-cache'}
+    # requests' json= encoding
+    return json.dumps(payload, allow_nan=False).encode(), headers
+
+
+builder = PayGPayloadBuilder(MID, AUTH_KEY, AUTH_TOKEN)
+
+
+def builder_build(payment_data):
+    return json_dumps(builder.build(payment_data)), builder.headers
+
+
+if __name__ == "__main__":
+    assert json.loads(legacy_build(PAYMENT_DATA)[0]) == json.loads(builder_build(PAYMENT_DATA)[0])
+
+    rows = []
+    for name, func in (("legacy", legacy_build), ("PayGPayloadBuilder", builder_build)):
+        best, _ = timeit(lambda: func(PAYMENT_DATA), repeat=5, number=N)
+        rows.append((name, f"{best * 1e6:.1f}", f"{1 / best:,.0f}"))
+    print(f"JSON encoder: {'orjson' if orjson is not None else 'stdlib json'}")
+    print_table(("builder", "us/payload", "payloads/s"), rows)
@@ -0,0 +1,62 @@
+"""
+PaymentSerializer (ModelSerializer over model instances) versus the read-only
+fast path (.values() + serialize_payment_rows) at several page sizes.
+
+    python -m benchmarks.payment_serializer
+"""
+from benchmarks.harness import make_user, print_table, setup_django, timeit
+
+setup_django()
+
+from django.utils import timezone  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from payments.models import Payment  # noqa: E402
+from payments.serializers import (  # noqa: E402
+    PaymentSerializer,
+    payment_read_values,
+    serialize_payment_rows,
+)
+
+SIZES = (10, 100, 1000)
+
+
+def seed(count):
+    user = make_user()
+    Payment.objects.bulk_create(
+        Payment(
+            user=user,
+            order_id=f"YKSER{i:06d}",
+            amount=f"{i % 5000}.50",
+            status="SUCCESS" if i % 3 else "PENDING",
+            payment_method="UPI",
+            transaction_id=f"TXN{i}",
+            customer_name="Bench User",
+            customer_email="bench@yourkirana.in",
+            customer_phone="9999999999",
+            payment_completed_at=timezone.now(),
+        )
+        for i in range(count)
+    )
+    return user
+
+
+def model_serializer(user, size):
+    rows = Payment.objects.filter(user=user)[:size]
+    return JSONRenderer().render(PaymentSerializer(rows, many=True).data)
+
+
+def fast_path(user, size):
+    rows = payment_read_values(Payment.objects.filter(user=user))[:size]
+    return JSONRenderer().render(serialize_payment_rows(rows))
+
+
+if __name__ == "__main__":
+    user = seed(max(SIZES))
+    rows = []
+    for size in SIZES:
+        assert model_serializer(user, size) == fast_path(user, size)
+        _, slow = timeit(lambda: model_serializer(user, size), repeat=7)
+        _, fast = timeit(lambda: fast_path(user, size), repeat=7)
+        rows.append((size, f"{slow * 1000:.2f}", f"{fast * 1000:.2f}", f"{slow / fast:.1f}x"))
+    print_table(("rows", "ModelSerializer ms", "fast path ms", "speedup"), rows)
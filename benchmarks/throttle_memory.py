@@ -0,0 +1,95 @@
+"""
+Memory and lookup cost of the sign-in throttle stores with many tracked keys
+(one key per client IP or email that signed in within the bucket period).
+
+    python -m benchmarks.throttle_memory [--keys 1000000] [--cache-keys 200000]
+
+"insert" is the cost of a request from a key not seen yet, "lookup" of one
+from a tracked key. CacheBucketStore is measured on LocMemCache, which
+pickles values and keeps per-key expiry; a networked cache adds a round
+trip to every lookup, but no memory to the worker.
+"""
+import argparse
+import gc
+import os
+import time
+import tracemalloc
+
+from benchmarks.harness import print_table
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "yourkirana.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.cache.backends.locmem import LocMemCache  # noqa: E402
+
+from accounts.throttling import CacheBucketStore, MemoryBucketStore, parse_rate  # noqa: E402
+
+num, period = parse_rate("30/min")
+INTERVAL = period / num
+TOLERANCE = period - INTERVAL
+
+
+class LocMemBucketStore(CacheBucketStore):
+    """CacheBucketStore on a private LocMemCache, so the run needs no CACHES entry"""
+
+    def __init__(self, max_entries):
+        self._cache = LocMemCache("throttle-bench", {"OPTIONS": {"MAX_ENTRIES": max_entries}})
+
+    @property
+    def cache(self):
+        return self._cache
+
+
+def key(i):
+    return f"login_ip:10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"
+
+
+def per_op_ns(store, keys):
+    started = time.perf_counter()
+    for i in range(keys):
+        store.consume(key(i), INTERVAL, TOLERANCE)
+    return (time.perf_counter() - started) / keys * 1e9
+
+
+def measure(name, make_store, keys):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = make_store()
+    per_op_ns(store, keys)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del store
+
+    # timed on a fresh store, without tracemalloc's per-allocation overhead
+    store = make_store()
+    insert = per_op_ns(store, keys)
+    lookup = per_op_ns(store, keys)
+    return (name, f"{keys:,}", f"{used / 2**20:.1f}", f"{used / keys:.0f}", f"{insert:.0f}", f"{lookup:.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=1_000_000)
+    parser.add_argument("--cache-keys", type=int, default=200_000)
+    args = parser.parse_args()
+
+    def memory_store():
+        return MemoryBucketStore(MAX_KEYS=args.keys)
+
+    def cache_store():
+        return LocMemBucketStore(max_entries=args.cache_keys + 1)
+
+    rows = [
+        measure("MemoryBucketStore", memory_store, args.keys),
+        measure("CacheBucketStore(locmem)", cache_store, args.cache_keys),
+    ]
+    print_table(("store", "keys", "MiB", "bytes/key", "insert ns", "lookup ns"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Queries issued per PayG webhook: the original write-per-step handler versus
+payments.services.process_webhook (one transaction, narrow updates, one log
+write).
+
+    python -m benchmarks.webhook_queries
+"""
+from benchmarks.harness import make_user, print_table, setup_django, timeit, unique
+
+setup_django()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from payments.models import Payment, PaymentWebhookLog  # noqa: E402
+from payments.services import process_webhook  # noqa: E402
+
+
+def legacy_process_webhook(data):
+    """The pre-transaction handler's database writes, step for step"""
+    webhook_log = PaymentWebhookLog.objects.create(webhook_data=data, processed=False)
+    payment = Payment.objects.filter(payg_order_id=data["OrderKeyId"]).first()
+    webhook_log.payment = payment
+    webhook_log.save()
+    payment.status = "SUCCESS"
+    payment.payment_completed_at = timezone.now()
+    payment.payment_method = "UPI"
+    payment.transaction_id = data.get("PaymentTransactionId")
+    payment.webhook_response = data
+    payment.save()
+    webhook_log.processed = True
+    webhook_log.save()
+
+
+def current_process_webhook(data):
+    process_webhook(PaymentWebhookLog(webhook_data=data, order_key_id=data["OrderKeyId"]))
+
+
+def pending_webhook():
+    """A PENDING payment and the success webhook for it"""
+    order_key_id = unique("PAYG")
+    Payment.objects.create(
+        user=make_user(),
+        order_id=f"YKBENCH-{order_key_id}",
+        amount=100,
+        customer_name="Bench User",
+        customer_email="bench@yourkirana.in",
+        customer_phone="9999999999",
+        payg_order_id=order_key_id,
+    )
+    return {
+        "OrderKeyId": order_key_id,
+        "PaymentStatus": 1,
+        "PaymentResponseText": "Approved",
+        "PaymentMethod": "UPI",
+        "PaymentTransactionId": f"TXN-{order_key_id}",
+    }
+
+
+def count_statements(captured_queries):
+    """(statements, writes, write transactions); autocommit writes are one transaction each"""
+    statements = writes = transactions = 0
+    in_transaction = False
+    for query in captured_queries:
+        verb = query["sql"].lstrip().split(None, 1)[0].upper()
+        if verb == "BEGIN":
+            in_transaction = True
+            transactions += 1
+        elif verb in ("COMMIT", "ROLLBACK"):
+            in_transaction = False
+        else:
+            statements += 1
+            if verb != "SELECT":
+                writes += 1
+                transactions += 0 if in_transaction else 1
+    return statements, writes, transactions
+
+
+def measure(handler):
+    data = pending_webhook()
+    with CaptureQueriesContext(connection) as ctx:
+        handler(data)
+    best, median = timeit(lambda: handler(pending_webhook()), repeat=50)
+    return (*count_statements(ctx.captured_queries), f"{median * 1000:.2f}")
+
+
+if __name__ == "__main__":
+    rows = [
+        ("before (write per step)", *measure(legacy_process_webhook)),
+        ("after (single transaction)", *measure(current_process_webhook)),
+    ]
+    print_table(("handler", "queries", "writes", "transactions", "median ms (incl. setup)"), rows)
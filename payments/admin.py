@@ -1,5 +1,7 @@
 from django.contrib import admin
+from yourkirana.db_router import replica_reads
 from .models import Payment, PaymentWebhookLog
+from .services import payment_status_changed
 
 
 
@@ -29,6 +31,21 @@ class PaymentAdmin(admin.ModelAdmin):
             'fields': ('created_at', 'updated_at', 'payment_completed_at')
         }),
     )
+    
+    def changelist_view(self, request, extra_context=None):
+        if request.method != 'GET':
+            return super().changelist_view(request, extra_context)
+        # Read-only listing: serve it from the replica. Render inside the
+        # block, since the changelist queries run at template render time.
+        with replica_reads(request.user.pk):
+            response = super().changelist_view(request, extra_context)
+            if hasattr(response, 'render'):
+                response.render()
+        return response
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        payment_status_changed(obj)
 
 @admin.register(PaymentWebhookLog)
 class PaymentWebhookLogAdmin(admin.ModelAdmin):
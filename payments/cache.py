@@ -0,0 +1,36 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+def status_cache():
+    return caches[settings.PAYMENT_STATUS_CACHE_ALIAS]
+
+
+def status_cache_key(order_id, user_id):
+    return f"payment-status:{user_id}:{order_id}"
+
+
+def payment_etag(payment_data):
+    """Strong ETag over the serialized payment, so any visible change alters it"""
+    body = json.dumps(payment_data, sort_keys=True, cls=DjangoJSONEncoder)
+    return '"%s"' % hashlib.md5(body.encode(), usedforsecurity=False).hexdigest()
+
+
+def get_cached_status(order_id, user_id):
+    """Cached ``(payment_data, etag)`` for PaymentStatusView, or None"""
+    return status_cache().get(status_cache_key(order_id, user_id))
+
+
+def cache_status(order_id, user_id, payment_data):
+    entry = (payment_data, payment_etag(payment_data))
+    status_cache().set(status_cache_key(order_id, user_id), entry)
+    return entry
+
+
+def invalidate_payment_status(payment):
+    """Call after any write to a Payment's status/visible fields"""
+    status_cache().delete(status_cache_key(payment.order_id, payment.user_id))
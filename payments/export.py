@@ -0,0 +1,163 @@
+"""
+Bulk Payment export as CSV or JSON Lines, shared by PaymentExportView and
+``manage.py export_payments``.
+
+Rows come from ``.values()`` over the scalar columns only (the
+payment_gateway_response/webhook_response JSON is never read) through
+``iterator(chunk_size=...)``, and are encoded one chunk at a time, so
+memory stays flat however many rows match. Reads go to the replica when
+one is configured. Under ASGI, serve ``aiter_chunks(export_chunks(...))``:
+StreamingHttpResponse reads a sync iterator into a list before sending it.
+"""
+import csv
+import io
+from datetime import datetime, time
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from yourkirana.db_router import REPLICA_DB_ALIAS, replica_configured
+from .models import Payment
+
+EXPORT_FIELDS = (
+    'id',
+    'order_id',
+    'user_id',
+    'amount',
+    'currency',
+    'status',
+    'payment_method',
+    'transaction_id',
+    'payg_order_id',
+    'customer_name',
+    'customer_email',
+    'customer_phone',
+    'created_at',
+    'updated_at',
+    'payment_completed_at',
+)
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson',
+}
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def parse_bound(value):
+    """
+    An ISO date or datetime, as an aware datetime (dates are midnight in
+    the current time zone). Raises ValueError.
+    """
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Invalid date: {value!r}")
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _choices(values, choices, name):
+    """Comma-separated or repeated values, each checked against the model's choices"""
+    picked = [value.strip() for item in values for value in item.split(',') if value.strip()]
+    unknown = set(picked) - {key for key, _ in choices}
+    if unknown:
+        raise ValueError(f"Unknown {name}: {', '.join(sorted(unknown))}")
+    return picked
+
+
+def parse_filters(created_from=None, created_to=None, statuses=(), methods=()):
+    """export_queryset() keyword arguments from request/command-line strings. Raises ValueError."""
+    return {
+        'created_from': parse_bound(created_from) if created_from else None,
+        'created_to': parse_bound(created_to) if created_to else None,
+        'statuses': _choices(statuses, Payment.PAYMENT_STATUS_CHOICES, 'status'),
+        'methods': _choices(methods, Payment.PAYMENT_METHOD_CHOICES, 'payment method'),
+    }
+
+
+def export_queryset(created_from=None, created_to=None, statuses=None, methods=None):
+    """
+    Payments created in [created_from, created_to), oldest first, with any
+    of ``statuses`` / ``methods`` (None or empty means any). The upper bound
+    is exclusive: created_to=2026-02-01 covers all of January.
+    """
+    database = REPLICA_DB_ALIAS if replica_configured() else DEFAULT_DB_ALIAS
+    queryset = Payment.objects.using(database)
+    if created_from is not None:
+        queryset = queryset.filter(created_at__gte=created_from)
+    if created_to is not None:
+        queryset = queryset.filter(created_at__lt=created_to)
+    if statuses:
+        queryset = queryset.filter(status__in=statuses)
+    if methods:
+        queryset = queryset.filter(payment_method__in=methods)
+    # payment_created_idx serves both the range and the order
+    return queryset.order_by('created_at', 'id').values(*EXPORT_FIELDS)
+
+
+def _csv_cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _csv_chunks(rows, chunk_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for count, row in enumerate(rows, 1):
+        writer.writerow([_csv_cell(value) for value in row.values()])
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _jsonl_chunks(rows, chunk_size):
+    encoder = DjangoJSONEncoder()
+    lines = []
+    for row in rows:
+        lines.append(encoder.encode(row))
+        if len(lines) == chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def export_chunks(queryset, fmt, chunk_size=DEFAULT_CHUNK_SIZE):
+    """The export of ``queryset`` as text, one string per ``chunk_size`` rows"""
+    rows = queryset.iterator(chunk_size=chunk_size)
+    if fmt == 'csv':
+        return _csv_chunks(rows, chunk_size)
+    if fmt == 'jsonl':
+        return _jsonl_chunks(rows, chunk_size)
+    raise ValueError(f"Unknown export format: {fmt!r}")
+
+
+async def aiter_chunks(chunks):
+    """
+    ``chunks`` as an async iterator, each chunk computed in the request's
+    sync thread (where the database cursor lives) only when it is sent.
+    """
+    chunks = iter(chunks)
+    done = object()
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    try:
+        while (chunk := await next_chunk(chunks, done)) is not done:
+            yield chunk
+    finally:
+        # Client gone or export finished: release the cursor now
+        if hasattr(chunks, 'close'):
+            await sync_to_async(chunks.close, thread_sensitive=True)()
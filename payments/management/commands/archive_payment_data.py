@@ -0,0 +1,183 @@
+import gzip
+import json
+import os
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from payments.models import Payment, PaymentWebhookLog
+
+FINAL_STATUSES = ('SUCCESS', 'FAILED', 'REFUNDED')
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive old processed PaymentWebhookLog rows to gzipped JSONL files "
+        "partitioned by month, delete them in batches, and move the JSON blobs "
+        "of old settled Payments to the archive as well. Safe to stop and "
+        "re-run with any --chunk-size: a chunk's parts are recorded in a "
+        "journal before they are written, and a re-run finishes (or discards) "
+        "an interrupted chunk before archiving anything else, so no row is "
+        "archived twice."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=90)
+        parser.add_argument('--output-dir', default=settings.PAYMENT_ARCHIVE_DIR)
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0.5,
+                            help="Pause between chunks so live traffic keeps the database")
+        parser.add_argument('--max-chunks', type=int, default=None,
+                            help="Stop after this many chunks (resume on the next run)")
+        parser.add_argument('--skip-payments', action='store_true',
+                            help="Only archive webhook logs")
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        self.output_dir = Path(options['output_dir'])
+        self.chunk_size = options['chunk_size']
+        self.sleep = options['sleep']
+        self.dry_run = options['dry_run']
+        self.chunks_left = options['max_chunks']
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+
+        archived = self.archive_webhook_logs(cutoff)
+        self.stdout.write(f"Archived {archived} webhook log(s)")
+
+        if not options['skip_payments']:
+            slimmed = self.slim_payments(cutoff)
+            self.stdout.write(f"Moved JSON blobs of {slimmed} payment(s) to the archive")
+
+    def archive_webhook_logs(self, cutoff):
+        queryset = (
+            PaymentWebhookLog.objects
+            .filter(processed=True, created_at__lt=cutoff)
+            .order_by('id')
+            .values('id', 'payment_id', 'order_key_id', 'webhook_data', 'attempts', 'created_at')
+        )
+        total = self.recover('webhook_logs', self.delete_webhook_logs)
+        for rows in self.chunks(queryset, 'id'):
+            self.archive_chunk('webhook_logs', rows, self.delete_webhook_logs)
+            total += len(rows)
+        return total
+
+    def delete_webhook_logs(self, ids):
+        with transaction.atomic():
+            return PaymentWebhookLog.objects.filter(id__in=ids).delete()[0]
+
+    def slim_payments(self, cutoff):
+        queryset = (
+            Payment.objects
+            .filter(status__in=FINAL_STATUSES, created_at__lt=cutoff)
+            .filter(Q(webhook_response__isnull=False) | Q(payment_gateway_response__isnull=False))
+            .order_by('id')
+            .values('id', 'order_id', 'payg_order_id', 'payment_gateway_response', 'webhook_response', 'created_at')
+        )
+        total = self.recover('payments', self.clear_payment_blobs)
+        for rows in self.chunks(queryset, 'id'):
+            self.archive_chunk('payments', rows, self.clear_payment_blobs)
+            total += len(rows)
+        return total
+
+    def clear_payment_blobs(self, ids):
+        # .update() leaves updated_at alone: nothing user-visible changed
+        return Payment.objects.filter(id__in=ids).update(
+            payment_gateway_response=None,
+            webhook_response=None,
+        )
+
+    def chunks(self, queryset, key):
+        """Keyset-paginated chunks, rate limited and capped by --max-chunks"""
+        last = None
+        while self.chunks_left is None or self.chunks_left > 0:
+            page = queryset if last is None else queryset.filter(**{f'{key}__gt': last})
+            rows = list(page[:self.chunk_size])
+            if not rows:
+                return
+            yield rows
+            last = rows[-1][key]
+            if self.chunks_left is not None:
+                self.chunks_left -= 1
+            time.sleep(self.sleep)
+
+    def journal_path(self, kind):
+        return self.output_dir / kind / 'in-progress.json'
+
+    def archive_chunk(self, kind, rows, finish):
+        """
+        Write ``rows`` to their parts, then ``finish`` them (delete/clear).
+        The journal lists the chunk's ids and parts from before the first
+        write until ``finish`` has committed.
+        """
+        partitions = self.partitions(kind, rows)
+        if self.dry_run:
+            for path, part_rows in partitions.items():
+                self.stdout.write(f"Would write {len(part_rows)} row(s) to {path}")
+            return
+
+        journal = self.journal_path(kind)
+        self.write_atomic(journal, json.dumps({
+            'ids': [row['id'] for row in rows],
+            'parts': [str(path) for path in partitions],
+        }, cls=DjangoJSONEncoder))
+        for path, part_rows in partitions.items():
+            self.write_atomic(path, ''.join(
+                json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in part_rows
+            ), compress=True)
+        finish([row['id'] for row in rows])
+        journal.unlink()
+
+    def recover(self, kind, finish):
+        """
+        Deal with a chunk a previous run left in the journal: if all its
+        parts were written, its rows are archived and only ``finish`` is
+        missing; otherwise the parts written so far are removed and the rows,
+        still in the database, are archived again by this run.
+        """
+        journal = self.journal_path(kind)
+        if not journal.exists():
+            return 0
+        chunk = json.loads(journal.read_text())
+        parts = [Path(path) for path in chunk['parts']]
+        if self.dry_run:
+            self.stdout.write(f"Would recover the interrupted {kind} chunk in {journal}")
+            return 0
+
+        if all(path.exists() for path in parts):
+            finished = finish(chunk['ids'])
+            self.stdout.write(f"Finished the interrupted {kind} chunk ({finished} row(s))")
+        else:
+            finished = 0
+            for path in parts:
+                path.unlink(missing_ok=True)
+            self.stdout.write(f"Discarded the partly written {kind} chunk")
+        journal.unlink()
+        return finished
+
+    def partitions(self, kind, rows):
+        """``rows`` by part file: <output>/<kind>/<YYYY>/<MM>/part-<first>-<last>.jsonl.gz"""
+        months = {}
+        for row in rows:
+            months.setdefault(row['created_at'].strftime('%Y/%m'), []).append(row)
+        return {
+            self.output_dir / kind / month / f"part-{month_rows[0]['id']}-{month_rows[-1]['id']}.jsonl.gz": month_rows
+            for month, month_rows in months.items()
+        }
+
+    def write_atomic(self, path, text, compress=False):
+        """Write ``text`` to ``path`` durably; a crash never leaves a truncated file behind"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        opener = gzip.open if compress else open
+        with opener(tmp_path, 'wt', encoding='utf-8') as fh:
+            fh.write(text)
+        with open(tmp_path, 'rb') as fh:
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, path)
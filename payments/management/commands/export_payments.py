@@ -0,0 +1,48 @@
+import gzip
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payments.export import CONTENT_TYPES, DEFAULT_CHUNK_SIZE, export_chunks, export_queryset, parse_filters
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream Payments as CSV or JSON Lines to a file (gzipped when it ends "
+        "in .gz) or stdout, in constant memory. Same engine and filters as "
+        "/api/payment/export/; --to is exclusive."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=tuple(CONTENT_TYPES), default='csv')
+        parser.add_argument('--output', default='-', help="File path, or - for stdout")
+        parser.add_argument('--from', dest='created_from', help="ISO date or datetime (inclusive)")
+        parser.add_argument('--to', dest='created_to', help="ISO date or datetime (exclusive)")
+        parser.add_argument('--status', action='append', default=[],
+                            help="Payment status; repeat or comma-separate for several")
+        parser.add_argument('--method', action='append', default=[],
+                            help="Payment method; repeat or comma-separate for several")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            filters = parse_filters(
+                options['created_from'],
+                options['created_to'],
+                options['status'],
+                options['method'],
+            )
+        except ValueError as e:
+            raise CommandError(e)
+
+        chunks = export_chunks(export_queryset(**filters), options['format'], options['chunk_size'])
+        output = options['output']
+        if output == '-':
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+
+        opener = gzip.open if output.endswith('.gz') else open
+        with opener(output, 'wt', encoding='utf-8', newline='') as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+        self.stdout.write(f"Wrote {output}")
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from payments.simulator import PayGSimulator
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local PayG stand-in for load tests. It answers order create and "
+        "order detail, and sends each order's webhook to --webhook-url after "
+        "--webhook-delay-ms. Start the app with "
+        "PAYG_BASE_URL=http://<host>:<port> so checkout talks to it, then drive "
+        "load with `python -m benchmarks.load_test`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--webhook-url', default='http://127.0.0.1:8000/api/payment/webhook/',
+                            help="PaymentWebhookView URL; empty to never send webhooks")
+        parser.add_argument('--latency-ms', type=float, default=50)
+        parser.add_argument('--jitter-ms', type=float, default=20)
+        parser.add_argument('--error-rate', type=float, default=0.0,
+                            help="Fraction of API calls answered with 503")
+        parser.add_argument('--webhook-delay-ms', type=float, default=200)
+        parser.add_argument('--decline-rate', type=float, default=0.1)
+        parser.add_argument('--drop-rate', type=float, default=0.0,
+                            help="Fraction of webhooks never sent (lost webhook)")
+        parser.add_argument('--duplicate-rate', type=float, default=0.0,
+                            help="Fraction of webhooks sent twice")
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        simulator = PayGSimulator(
+            host=options['host'],
+            port=options['port'],
+            webhook_url=options['webhook_url'] or None,
+            latency_ms=options['latency_ms'],
+            jitter_ms=options['jitter_ms'],
+            error_rate=options['error_rate'],
+            webhook_delay_ms=options['webhook_delay_ms'],
+            decline_rate=options['decline_rate'],
+            drop_rate=options['drop_rate'],
+            duplicate_rate=options['duplicate_rate'],
+            seed=options['seed'],
+        ).start()
+        self.stdout.write(f"PayG simulator listening on {simulator.base_url} (Ctrl-C to stop)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            simulator.stop()
+            self.stdout.write(' '.join(f"{key}={value}" for key, value in simulator.stats.items()))
@@ -0,0 +1,102 @@
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import F
+
+from payments.models import PaymentWebhookLog
+from payments.services import process_webhook
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply queued PayG webhooks (PAYMENT_WEBHOOK_MODE=queue) with a pool of "
+        "worker threads. Webhooks for the same OrderKeyId are applied one at a "
+        "time in arrival order; rows left processed=False are retried up to "
+        "--max-attempts. Rows without an OrderKeyId can never apply and are "
+        "failed at once. Run a single instance of this command."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--max-attempts', type=int, default=5)
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help="Seconds to sleep when the queue is empty")
+        parser.add_argument('--once', action='store_true',
+                            help="Drain the current backlog once and exit")
+
+    def handle(self, *args, **options):
+        self.max_attempts = options['max_attempts']
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                groups = self.next_batch(options['batch_size'])
+                if groups:
+                    results = list(pool.map(self.process_group, groups.values()))
+                    done = sum(ok for ok, _ in results)
+                    failed = sum(failed for _, failed in results)
+                    self.stdout.write(f"Processed {done} webhook(s), {failed} left for retry")
+                    if done:
+                        continue
+                if options['once']:
+                    break
+                # Queue empty, or everything in it is failing: back off before retrying
+                time.sleep(options['interval'])
+
+    def next_batch(self, batch_size):
+        """Pending rows grouped by OrderKeyId, oldest first within each group"""
+        rows = (
+            PaymentWebhookLog.objects
+            .filter(processed=False, attempts__lt=self.max_attempts)
+            .order_by('id')
+            .values_list('id', 'order_key_id')[:batch_size]
+        )
+        groups = OrderedDict()
+        unkeyed = []
+        for log_id, order_key_id in rows:
+            if order_key_id:
+                groups.setdefault(order_key_id, []).append(log_id)
+            else:
+                unkeyed.append(log_id)
+        if unkeyed:
+            # Retrying cannot help: use up their attempts so they are not claimed again
+            PaymentWebhookLog.objects.filter(id__in=unkeyed).update(
+                attempts=self.max_attempts,
+                last_error="Missing OrderKeyId",
+            )
+            self.stdout.write(f"Failed {len(unkeyed)} webhook(s) without an OrderKeyId")
+            if not groups:
+                return self.next_batch(batch_size)
+        return groups
+
+    def process_group(self, log_ids):
+        """
+        Apply one payment's webhooks in order. Stops at the first failure so a
+        later webhook never overtakes an earlier one that still needs a retry.
+        """
+        processed = 0
+        try:
+            for log_id in log_ids:
+                webhook_log = PaymentWebhookLog.objects.get(pk=log_id)
+                try:
+                    body, status_code = process_webhook(webhook_log)
+                    error = '' if webhook_log.processed else body.get('error', f"HTTP {status_code}")
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+
+                if not error:
+                    processed += 1
+                    continue
+
+                PaymentWebhookLog.objects.filter(pk=log_id).update(
+                    attempts=F('attempts') + 1,
+                    last_error=error,
+                )
+                return processed, len(log_ids) - processed
+            return processed, 0
+        finally:
+            # Worker threads open their own connections; don't leak them
+            connections.close_all()
@@ -0,0 +1,50 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from payments.reconciliation import Reconciler
+
+
+class Command(BaseCommand):
+    help = (
+        "Look up stale PENDING/PROCESSING payments at PayG and apply settled "
+        "outcomes (lost webhooks). Runs once by default, for cron/scheduler "
+        "jobs; --interval keeps it running. Keep --workers at or below "
+        "PAYG_POOL_SIZE so every lookup reuses a pooled connection."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.PAYG_CONFIG.get('POOL_SIZE', 10))
+        parser.add_argument('--chunk-size', type=int, default=200)
+        parser.add_argument('--stale-minutes', type=int, default=settings.PAYMENT_RECONCILE_STALE_MINUTES)
+        parser.add_argument('--limit', type=int, default=None,
+                            help="Check at most this many payments per run")
+        parser.add_argument('--interval', type=float, default=None,
+                            help="Repeat every N seconds instead of exiting")
+
+    def handle(self, *args, **options):
+        reconciler = Reconciler(
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            stale_after=timedelta(minutes=options['stale_minutes']),
+            on_batch=self.report_batch,
+        )
+        while True:
+            summary = reconciler.run(limit=options['limit'])
+            self.stdout.write(
+                f"Checked {summary['checked']} payment(s), updated {summary['updated']}, "
+                f"{summary['errors']} lookup error(s) in {summary['seconds']:.2f}s "
+                f"({summary['per_second']:.1f} payments/s)"
+            )
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
+
+    def report_batch(self, report):
+        self.stdout.write(
+            f"  batch {report['batch']}: {report['size']} checked, {report['updated']} updated, "
+            f"{report['errors']} errors, fetch {report['fetch_seconds'] * 1000:.0f}ms, "
+            f"apply {report['apply_seconds'] * 1000:.0f}ms"
+        )
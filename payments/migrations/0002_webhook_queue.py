@@ -0,0 +1,39 @@
+# Generated by Django 6.0.1 on 2026-10-17 02:03
+
+from django.db import migrations, models
+
+
+def backfill_order_key_id(apps, schema_editor):
+    # Only pending rows matter: they are what process_webhooks will pick up
+    PaymentWebhookLog = apps.get_model('payments', 'PaymentWebhookLog')
+    for log in PaymentWebhookLog.objects.filter(processed=False).iterator():
+        order_key_id = (log.webhook_data or {}).get('OrderKeyId') if isinstance(log.webhook_data, dict) else None
+        if order_key_id:
+            log.order_key_id = str(order_key_id)
+            log.save(update_fields=['order_key_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentwebhooklog',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='paymentwebhooklog',
+            name='last_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='paymentwebhooklog',
+            name='order_key_id',
+            field=models.CharField(blank=True, db_index=True, max_length=255),
+        ),
+        migrations.RunPython(backfill_order_key_id, migrations.RunPython.noop),
+    ]
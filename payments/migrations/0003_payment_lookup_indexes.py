@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-17 02:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def blank_payg_order_id_to_null(apps, schema_editor):
+    # NULLs don't collide under the new unique constraint; empty strings would
+    Payment = apps.get_model('payments', 'Payment')
+    Payment.objects.filter(payg_order_id='').update(payg_order_id=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0002_webhook_queue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(blank_payg_order_id_to_null, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='payment',
+            name='payg_order_id',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['user', '-created_at'], name='payment_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentwebhooklog',
+            index=models.Index(fields=['processed', 'created_at'], name='webhooklog_processed_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-17 02:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0006_payment_created_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paymentwebhooklog',
+            index=models.Index(condition=models.Q(('processed', False)), fields=['id'], name='webhooklog_pending_idx'),
+        ),
+    ]
@@ -33,7 +33,7 @@ class Payment(models.Model):
     
     # Payment gateway details
     transaction_id = models.CharField(max_length=255, blank=True, null=True)
-    payg_order_id = models.CharField(max_length=255, blank=True, null=True)
+    payg_order_id = models.CharField(max_length=255, blank=True, null=True, unique=True)
     payment_method = models.CharField(max_length=20, choices=PAYMENT_METHOD_CHOICES, blank=True, null=True)
     
     # Status
@@ -57,6 +57,14 @@ class Payment(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Payment'
         verbose_name_plural = 'Payments'
+        indexes = [
+            # PaymentHistoryView: filter(user=...) newest first, keyset on (created_at, id)
+            models.Index(fields=['user', '-created_at', '-id'], name='payment_user_history_idx'),
+            # Reconciler: stale PENDING/PROCESSING rows, keyset on (updated_at, id)
+            models.Index(fields=['status', 'updated_at', 'id'], name='payment_reconcile_idx'),
+            # payments.export: created_at range, oldest first
+            models.Index(fields=['created_at', 'id'], name='payment_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.order_id} - {self.amount} - {self.status}"
@@ -65,11 +73,22 @@ class Payment(models.Model):
 class PaymentWebhookLog(models.Model):
     payment = models.ForeignKey(Payment, on_delete=models.CASCADE, related_name='webhook_logs', null=True, blank=True)
     webhook_data = models.JSONField()
+    # PayG OrderKeyId copied out at ingest so the worker can keep per-payment ordering
+    order_key_id = models.CharField(max_length=255, blank=True, db_index=True)
     processed = models.BooleanField(default=False)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Admin changelist / retry queue: filter(processed=...) by date
+            models.Index(fields=['processed', 'created_at'], name='webhooklog_processed_idx'),
+            # process_webhooks: unprocessed rows in arrival order. Partial, so it
+            # stays as small as the backlog and SQLite can use it for `NOT processed`
+            models.Index(fields=['id'], condition=models.Q(processed=False), name='webhooklog_pending_idx'),
+        ]
     
     def __str__(self):
         return f"Webhook - {self.created_at}"
\ No newline at end of file
@@ -0,0 +1,147 @@
+import asyncio
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+
+class InProcessNotifier:
+    """
+    Wakes waiters in this process only.
+
+    ``notify`` is thread-safe, so sync code (the webhook view, the
+    process_webhooks worker) can wake coroutines waiting on the ASGI loop.
+    Use a cross-process backend when webhooks and waiters may land in
+    different workers.
+    """
+
+    def __init__(self, **options):
+        self._waiters = defaultdict(set)
+        self._lock = threading.Lock()
+
+    async def subscribe(self, key):
+        return _InProcessSubscription(self, key)
+
+    def notify(self, key):
+        with self._lock:
+            waiters = self._waiters.pop(key, ())
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+
+    def _add(self, key, waiter):
+        with self._lock:
+            self._waiters[key].add(waiter)
+
+    def _discard(self, key, waiter):
+        with self._lock:
+            waiters = self._waiters.get(key)
+            if waiters is not None:
+                waiters.discard(waiter)
+                if not waiters:
+                    del self._waiters[key]
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(True)
+
+
+class _InProcessSubscription:
+    # Registered on creation, so a notify() between subscribe() and wait()
+    # (e.g. while the caller re-reads the DB) is not lost. Same for the
+    # version snapshot taken by CacheNotifier.subscribe().
+
+    def __init__(self, notifier, key):
+        self.notifier = notifier
+        self.key = key
+        self._arm()
+
+    def _arm(self):
+        self.waiter = (asyncio.get_running_loop(), asyncio.get_running_loop().create_future())
+        self.notifier._add(self.key, self.waiter)
+
+    async def wait(self, timeout):
+        """
+        True if notified, False on timeout. Re-arms after a notification, so
+        the next call waits for the next one.
+        """
+        try:
+            await asyncio.wait_for(asyncio.shield(self.waiter[1]), timeout)
+        except asyncio.TimeoutError:
+            return False
+        # notify() already removed the fired waiter
+        self._arm()
+        return True
+
+    def close(self):
+        self.notifier._discard(self.key, self.waiter)
+
+
+class CacheNotifier:
+    """
+    Cross-process notifier over a shared Django cache (Redis/Memcached).
+
+    ``notify`` bumps a per-key version; waiters poll that version every
+    ``POLL_INTERVAL`` seconds. One cache GET per interval per waiter is far
+    cheaper than a client re-polling the status endpoint.
+    """
+
+    def __init__(self, CACHE_ALIAS='default', POLL_INTERVAL=0.5, **options):
+        self.cache_alias = CACHE_ALIAS
+        self.poll_interval = POLL_INTERVAL
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def version_key(self, key):
+        return f"payment-notify:{key}"
+
+    async def subscribe(self, key):
+        subscription = _CacheSubscription(self, key)
+        subscription.version = await self.cache.aget(subscription.key)
+        return subscription
+
+    def notify(self, key):
+        self.cache.set(self.version_key(key), time.time_ns(), timeout=300)
+
+
+class _CacheSubscription:
+
+    def __init__(self, notifier, key):
+        self.notifier = notifier
+        self.key = notifier.version_key(key)
+        self.version = None
+
+    async def wait(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            version = await self.notifier.cache.aget(self.key)
+            if version != self.version:
+                self.version = version
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            await asyncio.sleep(min(self.notifier.poll_interval, remaining))
+
+    def close(self):
+        pass
+
+
+_notifier = None
+_notifier_lock = threading.Lock()
+
+
+def get_notifier():
+    """The configured PAYMENT_NOTIFIER backend (one per process)"""
+    global _notifier
+    if _notifier is None:
+        with _notifier_lock:
+            if _notifier is None:
+                config = settings.PAYMENT_NOTIFIER
+                _notifier = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+    return _notifier
@@ -0,0 +1,24 @@
+from django.core.exceptions import ValidationError
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+
+class PaymentHistoryPagination(CursorPagination):
+    """
+    Keyset pagination for a user's payment history.
+
+    Pages are fetched with ``created_at < cursor ORDER BY created_at DESC,
+    id DESC LIMIT n`` on the (user, -created_at, -id) index, so page 500 costs
+    the same as page 1 (no OFFSET scan).
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        try:
+            return super().paginate_queryset(queryset, request, view)
+        except ValidationError:
+            # Well-formed cursor whose position is not a datetime
+            raise NotFound(self.invalid_cursor_message)
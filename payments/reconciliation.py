@@ -0,0 +1,157 @@
+"""
+Reconciliation of payments whose PayG webhook never arrived.
+
+Stale PENDING/PROCESSING payments are read in keyset chunks, their PayG
+order status is fetched concurrently over a bounded thread pool (sharing
+the gateway's keep-alive session), and settled orders are written back
+with one ``bulk_update`` per chunk through ``apply_payg_status``, the same
+transition code the webhook uses.
+
+    summary = Reconciler(workers=8).run()
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Payment
+from .services import PAYG_STATUS_FIELDS, apply_payg_status, payg_is_final, payment_status_changed
+from .utils import get_payment_gateway
+
+logger = logging.getLogger("payments")
+
+RECONCILABLE_STATUSES = ("PENDING", "PROCESSING")
+
+
+class Reconciler:
+
+    def __init__(self, gateway=None, workers=8, chunk_size=200, stale_after=None, on_batch=None):
+        self.gateway = gateway or get_payment_gateway()
+        self.workers = workers
+        self.chunk_size = chunk_size
+        if stale_after is None:
+            stale_after = timedelta(minutes=settings.PAYMENT_RECONCILE_STALE_MINUTES)
+        self.stale_after = stale_after
+        # Called with each batch report dict (the command prints them)
+        self.on_batch = on_batch
+
+    def stale_chunks(self, limit=None):
+        """
+        Lists of ``(id, payg_order_id)`` for stale payments, keyset-paginated
+        on (updated_at, id) so rows that stay pending are not read twice.
+        """
+        queryset = (
+            Payment.objects
+            .filter(
+                status__in=RECONCILABLE_STATUSES,
+                updated_at__lt=timezone.now() - self.stale_after,
+                payg_order_id__isnull=False,
+            )
+            .order_by("updated_at", "id")
+            .values_list("id", "payg_order_id", "updated_at")
+        )
+        seen = 0
+        last = None
+        while limit is None or seen < limit:
+            page = queryset
+            if last is not None:
+                page = page.filter(Q(updated_at__gt=last[2]) | Q(updated_at=last[2], id__gt=last[0]))
+            size = self.chunk_size if limit is None else min(self.chunk_size, limit - seen)
+            rows = list(page[:size])
+            if not rows:
+                return
+            yield [(payment_id, payg_order_id) for payment_id, payg_order_id, _ in rows]
+            seen += len(rows)
+            last = rows[-1]
+
+    def fetch(self, pool, chunk):
+        """PayG order details for ``chunk``: ``({payment_id: data}, errors)``"""
+        settled = {}
+        errors = 0
+        results = pool.map(lambda row: self.gateway.get_order_status(row[1]), chunk)
+        for (payment_id, payg_order_id), result in zip(chunk, results):
+            if not result.get("success"):
+                errors += 1
+                logger.warning("reconcile.lookup_failed", extra={
+                    "payg_order_id": payg_order_id,
+                    "error": result.get("error"),
+                })
+            elif payg_is_final(result["data"]):
+                settled[payment_id] = result["data"]
+        return settled, errors
+
+    def apply(self, settled):
+        """
+        Write PayG's outcome for ``{payment_id: data}``. Rows are locked and
+        re-checked, so a webhook that landed in the meantime wins.
+        Returns the updated payments.
+        """
+        if not settled:
+            return []
+        with transaction.atomic():
+            payments = list(
+                Payment.objects
+                .select_for_update()
+                .filter(id__in=settled, status__in=RECONCILABLE_STATUSES)
+            )
+            now = timezone.now()
+            for payment in payments:
+                apply_payg_status(payment, settled[payment.id])
+                # bulk_update does not run auto_now
+                payment.updated_at = now
+                transaction.on_commit(partial(payment_status_changed, payment))
+            Payment.objects.bulk_update(payments, PAYG_STATUS_FIELDS)
+        return payments
+
+    def run(self, limit=None):
+        """Reconcile every stale payment (at most ``limit``); returns a summary dict"""
+        summary = {"checked": 0, "updated": 0, "errors": 0, "batches": 0}
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for chunk in self.stale_chunks(limit):
+                batch_started = time.perf_counter()
+                settled, errors = self.fetch(pool, chunk)
+                fetched = time.perf_counter()
+                updated = self.apply(settled)
+                report = {
+                    "batch": summary["batches"] + 1,
+                    "size": len(chunk),
+                    "updated": len(updated),
+                    "errors": errors,
+                    "fetch_seconds": fetched - batch_started,
+                    "apply_seconds": time.perf_counter() - fetched,
+                }
+                logger.info("reconcile.batch", extra=report)
+                if self.on_batch:
+                    self.on_batch(report)
+                summary["batches"] += 1
+                summary["checked"] += len(chunk)
+                summary["updated"] += len(updated)
+                summary["errors"] += errors
+
+        summary["seconds"] = time.perf_counter() - started
+        summary["per_second"] = summary["checked"] / summary["seconds"] if summary["seconds"] else 0.0
+        logger.info("reconcile.done", extra=summary)
+        return summary
+
+
+def reconcile_payment(payment, gateway=None):
+    """
+    Ask PayG about one PENDING/PROCESSING ``payment`` and apply a settled
+    outcome (PaymentVerifyView). Returns the PayG lookup result; ``payment``
+    is refreshed if it changed.
+    """
+    if payment.status not in RECONCILABLE_STATUSES or not payment.payg_order_id:
+        return None
+    reconciler = Reconciler(gateway=gateway)
+    result = reconciler.gateway.get_order_status(payment.payg_order_id)
+    if result.get("success") and payg_is_final(result["data"]):
+        if reconciler.apply({payment.id: result["data"]}):
+            payment.refresh_from_db()
+    return result
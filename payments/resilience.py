@@ -0,0 +1,177 @@
+import random
+import threading
+import time
+from collections import deque
+
+
+class CircuitBreaker:
+    """
+    Rolling-window circuit breaker around an outbound dependency.
+
+    CLOSED: calls go through and their outcome is recorded.
+    OPEN: calls are rejected immediately until ``reset_timeout`` passes.
+    HALF_OPEN: a single trial call decides whether to close or re-open.
+    Every allowed call must end in record_success, record_failure or release.
+
+    The breaker opens when, over the last ``window_size`` calls (and at least
+    ``min_calls`` of them), either the failure rate or the slow-call rate
+    reaches ``failure_rate_threshold``.
+    """
+
+    CLOSED = 'CLOSED'
+    OPEN = 'OPEN'
+    HALF_OPEN = 'HALF_OPEN'
+
+    def __init__(self, name, failure_rate_threshold=0.5, slow_call_seconds=5.0,
+                 window_size=20, min_calls=10, reset_timeout=30.0, clock=time.monotonic):
+        self.name = name
+        self.clock = clock
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self._window = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._opened_at = None
+        self._trial_in_flight = False
+        self.counters = {
+            'calls': 0,
+            'successes': 0,
+            'failures': 0,
+            'slow_calls': 0,
+            'rejected': 0,
+            'opened': 0,
+        }
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == self.OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    def allow_request(self):
+        """Return True if a call may proceed; counts a rejection otherwise"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.counters['rejected'] += 1
+            return False
+
+    def release(self):
+        """
+        For an allowed call that ended without an outcome (cancelled, or an
+        unexpected error): frees the half-open trial so the next call can probe.
+        """
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._trial_in_flight = False
+
+    def record_success(self, duration):
+        self._record(failed=False, duration=duration)
+
+    def record_failure(self, duration):
+        self._record(failed=True, duration=duration)
+
+    def _record(self, failed, duration):
+        slow = duration >= self.slow_call_seconds
+        with self._lock:
+            self.counters['calls'] += 1
+            self.counters['failures' if failed else 'successes'] += 1
+            if slow:
+                self.counters['slow_calls'] += 1
+
+            if self._state == self.HALF_OPEN:
+                if failed or slow:
+                    self._open()
+                else:
+                    self._state = self.CLOSED
+                    self._window.clear()
+                return
+
+            self._window.append((failed, slow))
+            if self._state == self.CLOSED and len(self._window) >= self.min_calls:
+                calls = len(self._window)
+                failure_rate = sum(1 for f, _ in self._window if f) / calls
+                slow_rate = sum(1 for _, s in self._window if s) / calls
+                if failure_rate >= self.failure_rate_threshold or slow_rate >= self.failure_rate_threshold:
+                    self._open()
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = self.clock()
+        self._trial_in_flight = False
+        self._window.clear()
+        self.counters['opened'] += 1
+
+    def snapshot(self):
+        """State and counters, for health checks and alerting"""
+        with self._lock:
+            return {
+                'name': self.name,
+                'state': self._current_state(),
+                **self.counters,
+            }
+
+
+class RetryBudget:
+    """
+    Caps retries at a fraction of recent requests so retries cannot multiply
+    load on a dependency that is already struggling.
+
+    Every request deposits one token; a retry is allowed only while retries
+    in the last ``ttl`` seconds stay under ``min_retries`` plus ``ratio`` of
+    the requests seen in that window.
+    """
+
+    def __init__(self, ratio=0.2, min_retries=3, ttl=10.0, clock=time.monotonic):
+        self.ratio = ratio
+        self.clock = clock
+        self.min_retries = min_retries
+        self.ttl = ttl
+        self._requests = deque()
+        self._retries = deque()
+        self._lock = threading.Lock()
+        self.counters = {'retries': 0, 'retries_denied': 0}
+
+    def _expire(self, now):
+        cutoff = now - self.ttl
+        for events in (self._requests, self._retries):
+            while events and events[0] < cutoff:
+                events.popleft()
+
+    def deposit(self):
+        now = self.clock()
+        with self._lock:
+            self._expire(now)
+            self._requests.append(now)
+
+    def withdraw(self):
+        """Return True (and record the retry) if the budget allows another retry"""
+        now = self.clock()
+        with self._lock:
+            self._expire(now)
+            if len(self._retries) >= self.min_retries + self.ratio * len(self._requests):
+                self.counters['retries_denied'] += 1
+                return False
+            self._retries.append(now)
+            self.counters['retries'] += 1
+            return True
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counters)
+
+
+def backoff_delay(attempt, base=0.2, cap=2.0):
+    """Full-jitter exponential backoff for the given retry attempt (1-based)"""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
@@ -1,3 +1,6 @@
+from decimal import Decimal
+
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Payment
 
@@ -15,6 +18,45 @@ class PaymentSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'order_id', 'created_at']
 
+# Read-only fast path: rows from .values(*PAYMENT_READ_FIELDS) encoded as plain
+# dicts, byte-for-byte the same JSON as PaymentSerializer without per-field
+# DRF machinery. Keep in sync with PaymentSerializer.Meta.fields.
+PAYMENT_READ_FIELDS = tuple(PaymentSerializer.Meta.fields)
+
+_CENTS = Decimal('0.01')
+
+
+def _datetime_representation(value):
+    # Same as DRF DateTimeField: current timezone, ISO 8601, UTC as "Z"
+    if value is None:
+        return None
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    text = value.isoformat()
+    if text.endswith('+00:00'):
+        text = text[:-6] + 'Z'
+    return text
+
+
+def serialize_payment_row(row):
+    """PaymentSerializer(...).data for one .values() row"""
+    data = dict(row)
+    data['id'] = str(row['id'])
+    data['amount'] = None if row['amount'] is None else format(row['amount'].quantize(_CENTS), 'f')
+    data['created_at'] = _datetime_representation(row['created_at'])
+    data['payment_completed_at'] = _datetime_representation(row['payment_completed_at'])
+    return data
+
+
+def serialize_payment_rows(rows):
+    return [serialize_payment_row(row) for row in rows]
+
+
+def payment_read_values(queryset):
+    """Restrict a Payment queryset to exactly the columns the read API returns"""
+    return queryset.values(*PAYMENT_READ_FIELDS)
+
+
 class PaymentStatusSerializer(serializers.Serializer):
     order_id = serializers.CharField()
     status = serializers.CharField()
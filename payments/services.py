@@ -0,0 +1,268 @@
+import logging
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from yourkirana.db_router import mark_write
+from yourkirana.metrics import WEBHOOK_LAG_SECONDS
+
+from .cache import invalidate_payment_status
+from .models import Payment
+from .notifier import get_notifier
+
+logger = logging.getLogger("payments")
+
+
+DEFAULT_CUSTOMER_PHONE = "9999999999"
+
+
+def payment_status_changed(payment):
+    """
+    Call after any write to a Payment's status: drops the cached status,
+    pins the owner's reads to the primary and wakes waiters.
+    """
+    invalidate_payment_status(payment)
+    mark_write(payment.user_id)
+    get_notifier().notify(payment.order_id)
+
+
+def new_order_id():
+    """Internal order ID (YOUR system)"""
+    return f"YK{uuid.uuid4().hex[:12].upper()}"
+
+
+def pending_payment_fields(user, order_id, amount):
+    """Field values for the PENDING Payment row created before calling PayG"""
+    return {
+        "user": user,
+        "order_id": order_id,
+        "amount": amount,
+        "customer_name": user.full_name,
+        "customer_email": user.email,
+        "customer_phone": user.phone or DEFAULT_CUSTOMER_PHONE,
+        "status": "PENDING",
+    }
+
+
+def gateway_payment_data(user, order_id, amount):
+    """payment_data argument for PayGPaymentGateway.create_payment_request"""
+    return {
+        "order_id": order_id,
+        "amount": float(amount),
+        "customer_name": user.full_name,
+        "customer_email": user.email,
+        "customer_phone": user.phone or DEFAULT_CUSTOMER_PHONE,
+        "user_id": str(user.id),
+        "callback_url": settings.PAYG_CONFIG["CALLBACK_URL"],
+        "return_url": settings.PAYG_CONFIG["RETURN_URL"],
+    }
+
+
+def apply_gateway_result(payment, result):
+    """
+    Copy a PayG order create result onto ``payment`` (not saved).
+
+    Returns ``(body, status_code)`` for the API response so the sync and
+    async initiate views answer identically.
+    """
+    # ⛔ Circuit open: PayG is failing, answer fast instead of queueing workers
+    if result.get("circuit_open"):
+        payment.status = "FAILED"
+        payment.payment_gateway_response = result
+        return {"success": False, "message": "Payment gateway temporarily unavailable, please retry shortly"}, 503
+
+    # ❌ Payment gateway failure
+    if not result.get("success"):
+        payment.status = "FAILED"
+        payment.payment_gateway_response = result
+        return {"success": False, "message": "Payment initiation failed"}, 400
+
+    # 🔴 VERY IMPORTANT PART 🔴
+    payg_data = result.get("data", {})
+    payg_order_id = payg_data.get("OrderKeyId")
+
+    if not payg_order_id:
+        payment.status = "FAILED"
+        payment.payment_gateway_response = result
+        return {"success": False, "message": "Invalid PayG response (OrderKeyId missing)"}, 400
+
+    # ✅ SAVE PayG OrderKeyId (WEBHOOK KEY)
+    payment.payg_order_id = payg_order_id
+    payment.payment_gateway_response = payg_data
+
+    return {
+        "success": True,
+        "order_id": payment.order_id,
+        "payment_url": payg_data.get("PaymentProcessUrl"),
+    }, 200
+
+
+# PayG PaymentMethod -> Payment.PAYMENT_METHOD_CHOICES
+PAYMENT_METHOD_MAPPING = {
+    "UPI": "UPI",
+    "DEBIT CARD": "DEBIT_CARD",
+    "CREDIT CARD": "CREDIT_CARD",
+    "DEBITCARD": "DEBIT_CARD",
+    "CREDITCARD": "CREDIT_CARD",
+    "NET BANKING": "NET_BANKING",
+    "NETBANKING": "NET_BANKING",
+    "WALLET": "WALLET",
+}
+
+# Fields apply_payg_status may change (plus auto_now updated_at)
+PAYG_STATUS_FIELDS = [
+    "status",
+    "payment_completed_at",
+    "payment_method",
+    "transaction_id",
+    "webhook_response",
+    "updated_at",
+]
+
+
+# Words in PayG's status texts that mean the order will not be paid
+PAYG_FAILURE_WORDS = ("fail", "declin", "reject", "cancel", "expired")
+
+
+def _payg_status_texts(data):
+    return (
+        (data.get("PaymentResponseText") or "").lower(),
+        (data.get("OrderPaymentStatusText") or "").lower(),
+    )
+
+
+def payg_is_success(data):
+    """True if a PayG order status (webhook body or order detail) says paid"""
+    payment_response_text, order_payment_status_text = _payg_status_texts(data)
+    return (
+        data.get("PaymentStatus") == 1 or 
+        "approved" in payment_response_text or 
+        "paid" in order_payment_status_text or
+        "success" in payment_response_text
+    )
+
+
+def payg_is_final(data):
+    """
+    True if PayG has settled the order either way. Webhooks are only sent
+    for settled orders; an order detail lookup can still say "pending".
+    """
+    if payg_is_success(data):
+        return True
+    texts = _payg_status_texts(data)
+    return any(word in text for text in texts for word in PAYG_FAILURE_WORDS)
+
+
+def apply_payg_status(payment, data):
+    """
+    Copy a PayG order status (webhook body or order detail response) onto
+    ``payment`` without saving. Save with ``update_fields=PAYG_STATUS_FIELDS``.
+    """
+    # 5-6. Extract payment details from PayG webhook, determine if successful
+    if payg_is_success(data):
+        payment.status = "SUCCESS"
+        payment.payment_completed_at = timezone.now()
+    else:
+        payment.status = "FAILED"
+
+    # 7. Map PayG payment method to your choices
+    payg_payment_method = (data.get("PaymentMethod") or "").upper()
+    payment.payment_method = PAYMENT_METHOD_MAPPING.get(
+        payg_payment_method, 
+        "UPI"  # Default fallback
+    )
+
+    # 8. Save transaction details
+    payment.transaction_id = (
+        data.get("PaymentTransactionId") or 
+        data.get("PaymentTransactionRefNo") or
+        data.get("TransactionId")
+    )
+    
+    # Save the full webhook response
+    payment.webhook_response = data
+
+
+def _save_log(webhook_log, update_fields):
+    """One write for the log's final state: INSERT if new, else a narrow UPDATE"""
+    if webhook_log.pk is None:
+        webhook_log.save()
+    elif update_fields:
+        webhook_log.save(update_fields=update_fields)
+
+
+def _observe_lag(webhook_log):
+    """Time from receiving the webhook (log row created) to applying it"""
+    WEBHOOK_LAG_SECONDS.observe((timezone.now() - webhook_log.created_at).total_seconds())
+
+
+def process_webhook(webhook_log):
+    """
+    Apply a PayG webhook to its Payment in a single transaction.
+
+    ``webhook_log`` may be unsaved (inline processing: it is inserted once,
+    already in its final state) or a stored row from the queue (updated
+    once). The Payment row is locked for the duration so concurrent
+    webhooks for the same order apply one after the other.
+
+    Used inline by PaymentWebhookView and by the process_webhooks worker.
+    Returns ``(body, status_code)``; unexpected errors propagate to the caller
+    and roll the whole unit back.
+    """
+    data = webhook_log.webhook_data
+
+    # 2. Get PayG Order ID
+    payg_order_id = data.get("OrderKeyId")
+    if not payg_order_id:
+        logger.warning("webhook.missing_order_key_id", extra={"webhook_log_id": webhook_log.pk})
+        _save_log(webhook_log, [])
+        return {"success": False, "error": "Missing OrderKeyId"}, 400
+
+    with transaction.atomic():
+        # 3. Find payment by PayG Order ID
+        payment = (
+            Payment.objects
+            .select_for_update()
+            .filter(payg_order_id=payg_order_id)
+            .first()
+        )
+        if not payment:
+            logger.warning("webhook.payment_not_found", extra={"payg_order_id": payg_order_id})
+            _save_log(webhook_log, [])
+            return {"success": False, "error": "Payment not found"}, 404
+
+        # Link webhook log to payment
+        webhook_log.payment = payment
+        webhook_log.processed = True
+
+        # 4. Idempotency: already processed
+        if payment.status == "SUCCESS":
+            logger.info("webhook.duplicate", extra={"order_id": payment.order_id, "payg_order_id": payg_order_id})
+            _save_log(webhook_log, ["payment", "processed"])
+            _observe_lag(webhook_log)
+            return {"success": True, "message": "Already processed"}, 200
+
+        apply_payg_status(payment, data)
+        payment.save(update_fields=PAYG_STATUS_FIELDS)
+        transaction.on_commit(lambda: payment_status_changed(payment))
+
+        # Mark webhook as processed
+        _save_log(webhook_log, ["payment", "processed"])
+        _observe_lag(webhook_log)
+
+    logger.info("webhook.processed", extra={
+        "order_id": payment.order_id,
+        "status": payment.status,
+        "payment_method": payment.payment_method,
+        "transaction_id": payment.transaction_id,
+        "amount": payment.amount,
+        "payg_status": data.get("PaymentStatus"),
+    })
+
+    return {
+        "success": True, 
+        "message": "Payment updated successfully",
+        "order_id": payment.order_id,
+        "status": payment.status
+    }, 200
@@ -0,0 +1,212 @@
+"""
+Local PayG stand-in for load tests (``manage.py payg_simulator``).
+
+Answers the two PayG calls this app makes:
+
+    POST /payment/api/order/create   OrderKeyId + PaymentProcessUrl
+    POST /payment/api/order/Detail   the order's current status
+
+and, like PayG, settles every created order a little later by POSTing a
+webhook to ``webhook_url`` (PaymentWebhookView). Response latency, error
+rate and webhook behavior (delay, declines, lost and duplicate deliveries)
+are configurable. Point the app at it with ``PAYG_BASE_URL``.
+
+No Django imports: the load driver can run it in-process.
+"""
+import heapq
+import json
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+ORDER_CREATE_PATH = "/payment/api/order/create"
+ORDER_DETAIL_PATH = "/payment/api/order/Detail"
+
+
+class PayGSimulator:
+
+    def __init__(self, host="127.0.0.1", port=8765, webhook_url=None,
+                 latency_ms=50, jitter_ms=20, error_rate=0.0,
+                 webhook_delay_ms=200, decline_rate=0.1, drop_rate=0.0,
+                 duplicate_rate=0.0, webhook_workers=8, seed=None):
+        self.webhook_url = webhook_url
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.webhook_delay_ms = webhook_delay_ms
+        self.decline_rate = decline_rate
+        self.drop_rate = drop_rate
+        self.duplicate_rate = duplicate_rate
+
+        self.orders = {}
+        self.stats = dict.fromkeys(
+            ("created", "errors", "webhooks_sent", "webhooks_failed", "webhooks_dropped"), 0
+        )
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        # Webhooks due later: (due, seq, body) heap drained by one scheduler thread
+        self._due = []
+        self._seq = 0
+        self._wakeup = threading.Condition(self._lock)
+        self._stopping = False
+        self._senders = ThreadPoolExecutor(max_workers=webhook_workers)
+        self._session = requests.Session()
+
+        self.server = ThreadingHTTPServer((host, port), _handler_for(self))
+        self.server.daemon_threads = True
+        self._threads = []
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def chance(self, rate):
+        with self._lock:
+            return self._random.random() < rate
+
+    def delay(self):
+        """Simulated PayG processing time for one API call"""
+        with self._lock:
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms)
+        time.sleep(max(0.0, self.latency_ms + jitter) / 1000)
+
+    def create_order(self, payload):
+        order_key_id = f"SIM{uuid.uuid4().hex[:16].upper()}"
+        order = {
+            "OrderKeyId": order_key_id,
+            "MerchantKeyId": payload.get("MID"),
+            "UniqueRequestId": payload.get("UniqueRequestId"),
+            "OrderAmount": payload.get("OrderAmount"),
+            "OrderStatus": "Initiating",
+            "PaymentStatus": 0,
+            "OrderPaymentStatusText": "Pending",
+        }
+        with self._lock:
+            self.orders[order_key_id] = order
+            self.stats["created"] += 1
+        self.schedule_settlement(order_key_id)
+        return {
+            **order,
+            "PaymentProcessUrl": f"{self.base_url}/pay/{order_key_id}",
+        }
+
+    def order_detail(self, order_key_id):
+        with self._lock:
+            order = self.orders.get(order_key_id)
+            return dict(order) if order else None
+
+    def settle(self, order_key_id):
+        """Decide the order's outcome; returns the webhook body"""
+        declined = self.chance(self.decline_rate)
+        with self._lock:
+            order = self.orders[order_key_id]
+            order.update({
+                "OrderStatus": "Completed",
+                "PaymentStatus": 2 if declined else 1,
+                "PaymentResponseText": "Declined" if declined else "Approved",
+                "OrderPaymentStatusText": "Failed" if declined else "Paid",
+                "PaymentMethod": "UPI",
+                "PaymentTransactionId": f"SIMTXN{uuid.uuid4().hex[:12].upper()}",
+            })
+            return dict(order)
+
+    def schedule_settlement(self, order_key_id):
+        with self._wakeup:
+            self._seq += 1
+            due = time.monotonic() + self.webhook_delay_ms / 1000
+            heapq.heappush(self._due, (due, self._seq, order_key_id))
+            self._wakeup.notify()
+
+    def _scheduler(self):
+        while True:
+            with self._wakeup:
+                while not self._stopping and (not self._due or self._due[0][0] > time.monotonic()):
+                    self._wakeup.wait(self._due[0][0] - time.monotonic() if self._due else None)
+                if self._stopping:
+                    return
+                _, _, order_key_id = heapq.heappop(self._due)
+            self._senders.submit(self._deliver, order_key_id)
+
+    def _deliver(self, order_key_id):
+        body = self.settle(order_key_id)
+        if not self.webhook_url or self.chance(self.drop_rate):
+            # Lost webhook: the order is settled at "PayG", only reconciliation finds out
+            with self._lock:
+                self.stats["webhooks_dropped"] += 1
+            return
+        copies = 2 if self.chance(self.duplicate_rate) else 1
+        for _ in range(copies):
+            try:
+                response = self._session.post(self.webhook_url, json=body, timeout=10)
+                ok = response.status_code < 500
+            except requests.exceptions.RequestException:
+                ok = False
+            with self._lock:
+                self.stats["webhooks_sent" if ok else "webhooks_failed"] += 1
+
+    def start(self):
+        """Serve and send webhooks from background threads"""
+        self._threads = [
+            threading.Thread(target=self.server.serve_forever, daemon=True),
+            threading.Thread(target=self._scheduler, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify()
+        self.server.shutdown()
+        self.server.server_close()
+        self._senders.shutdown(wait=True)
+        self._session.close()
+
+
+def _handler_for(simulator):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                return self.reply(400, {"Message": "Invalid JSON"})
+
+            simulator.delay()
+            if simulator.chance(simulator.error_rate):
+                with simulator._lock:
+                    simulator.stats["errors"] += 1
+                return self.reply(503, {"Message": "Simulated PayG outage"})
+
+            if self.path == ORDER_CREATE_PATH:
+                return self.reply(200, simulator.create_order(payload))
+            if self.path == ORDER_DETAIL_PATH:
+                order = simulator.order_detail(payload.get("OrderKeyId"))
+                if order is None:
+                    return self.reply(404, {"Message": "Order not found"})
+                return self.reply(200, order)
+            return self.reply(404, {"Message": "Unknown endpoint"})
+
+        def reply(self, status_code, body):
+            payload = json.dumps(body).encode()
+            self.send_response(status_code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
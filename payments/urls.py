@@ -1,17 +1,25 @@
 from django.urls import path
 from .views import (
     InitiatePaymentView,
+    AsyncInitiatePaymentView,
     PaymentWebhookView,
     PaymentStatusView,
+    PaymentWaitView,
     PaymentHistoryView,
-    PaymentVerifyView
+    PaymentVerifyView,
+    GatewayHealthView,
+    PaymentExportView,
 )
 
 
 urlpatterns = [
     path('initiate/', InitiatePaymentView.as_view(), name='payment_initiate'),
+    path('initiate/async/', AsyncInitiatePaymentView.as_view(), name='payment_initiate_async'),
     path('webhook/', PaymentWebhookView.as_view(), name='payment_webhook'),
-    path('status/', PaymentStatusView.as_view(), name='payment_status'),
+    path('status/<str:order_id>/', PaymentStatusView.as_view(), name='payment_status'),
+    path('status/<str:order_id>/wait/', PaymentWaitView.as_view(), name='payment_status_wait'),
     path('history/', PaymentHistoryView.as_view(), name='payment_history'),
     path('verify/', PaymentVerifyView.as_view(), name='payment_verify'),
+    path('export/', PaymentExportView.as_view(), name='payment_export'),
+    path('gateway/health/', GatewayHealthView.as_view(), name='payment_gateway_health'),
 ]
\ No newline at end of file
@@ -1,34 +1,102 @@
-import hashlib
-import hmac
+import asyncio
+import atexit
 import json
+import logging
+import threading
+import time
+import weakref
+import httpx
 import requests
 import base64
-from datetime import datetime
+from datetime import date
 from django.conf import settings
+from django.core.signals import setting_changed
+from requests.adapters import HTTPAdapter
 
-class PayGPaymentGateway:
-    def __init__(self):
-        self.config = settings.PAYG_CONFIG
-        self.merchant_key_id = self.config['MERCHANT_KEY_ID']
-        self.mid = self.config['MID']
-        # Remove 0x prefix if present
-        self.auth_key = self.config['AUTHENTICATION_KEY']
-        self.auth_token = self.config['AUTHENTICATION_TOKEN']   
-        self.payment_url = self.config['PAYMENT_URL']
+try:
+    import orjson
+except ImportError:  # optional speed-up, stdlib json is the fallback
+    orjson = None
+
+from yourkirana.metrics import PAYG_SECONDS
+
+from .resilience import CircuitBreaker, RetryBudget, backoff_delay
+
+logger = logging.getLogger("payments")
+
+# Gateway overload / upstream errors that are safe to retry with the same UniqueRequestId
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+
+def json_dumps(obj):
+    """Compact JSON as bytes, via orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+
+class PayGPayloadBuilder:
+    """
+    Builds PayG order create requests.
     
-    def generate_basic_auth(self):
-        """Generate Basic Authentication header for PayG"""
+    Everything that only depends on the merchant config (auth header,
+    headers, the empty/constant payload sections) is computed once; per
+    order only the variable fields are filled in and the customer name is
+    split a single time.
+    """
+    
+    TRANSACTION_DATA = {
+        "AcceptedPaymentTypes": "",
+        "PaymentType": "",
+        "SurchargeType": "",
+        "SurchargeValue": "",
+        "RefTransactionId": "",
+        "IndustrySpecificationCode": "",
+        "PartialPaymentOption": ""
+    }
+    ORDER_AMOUNT_DATA = {
+        "AmountTypeDesc": "",
+        "Amount": ""
+    }
+    CUSTOMER_DATA = {
+        "CustomerNotes": "Order from YourKirana",
+        "EmailReceipt": "true",
+        "BillingAddress": "",
+        "BillingCity": "",
+        "BillingState": "",
+        "BillingCountry": "India",
+        "BillingZipCode": "",
+        "ShippingAddress": "",
+        "ShippingCity": "",
+        "ShippingState": "",
+        "ShippingCountry": "India",
+        "ShippingZipCode": "",
+    }
+    
+    def __init__(self, mid, auth_key, auth_token):
+        self.mid = mid
         # Format: ::M:
-        auth_string = f"{self.auth_key}:{self.auth_token}:M:{self.mid}"
-        
-        # Encode to base64
+        auth_string = f"{auth_key}:{auth_token}:M:{mid}"
         encoded = base64.b64encode(auth_string.encode()).decode()
-        
-        return f"basic {encoded}"  # lowercase 'basic' as per PayG docs
+        self.auth_header = f"basic {encoded}"  # lowercase 'basic' as per PayG docs
+        self.headers = {
+            'Content-Type': 'application/json',
+            'Authorization': self.auth_header,
+            'cache-control': 'no-cache'
+        }
+        self._request_date = (None, None)
     
-    def create_payment_request(self, payment_data):
+    def request_date(self):
+        """Current date in PayG format (YYYYMMDD), reformatted only when the day changes"""
+        today = date.today()
+        cached_day, formatted = self._request_date
+        if cached_day != today:
+            formatted = today.strftime('%Y%m%d')
+            self._request_date = (today, formatted)
+        return formatted
+    
+    def build(self, payment_data):
         """
-        Create payment request to PayG
+        Build the PayG order create payload
         
         payment_data should contain:
         - order_id
@@ -39,106 +107,417 @@ class PayGPaymentGateway:
         - callback_url
         - return_url
         """
+        order_id = payment_data['order_id']
+        amount = str(payment_data['amount'])
+        phone = payment_data['customer_phone']
+        email = payment_data['customer_email']
+        
+        name_parts = (payment_data['customer_name'] or '').split()
+        first_name = name_parts[0] if name_parts else ''
+        last_name = ' '.join(name_parts[1:])
         
-        # Get current datetime in PayG format (YYYYMMDD)
-        current_datetime = datetime.now().strftime('%Y%m%d')
+        customer_data = dict(self.CUSTOMER_DATA)
+        customer_data.update({
+            "CustomerId": str(payment_data.get('user_id', '')),
+            "FirstName": first_name,
+            "LastName": last_name,
+            "MobileNo": phone,
+            "Email": email,
+            "ShippingFirstName": first_name,
+            "ShippingLastName": last_name,
+            "ShippingMobileNo": phone,
+            "ShippingEmail": email,
+        })
         
-        # Prepare payment payload according to PayG format
-        payload = {
+        return {
             "MID": self.mid,
-            "UniqueRequestId": payment_data['order_id'],
+            "UniqueRequestId": order_id,
+            # A string PayG stores as sent: keep json.dumps' default separators
             "ProductData": json.dumps({
                 "ProductName": "YourKirana Order",
-                "ProductInfo": f"Order {payment_data['order_id']}",
-                "ProductPrice": str(payment_data['amount'])
+                "ProductInfo": f"Order {order_id}",
+                "ProductPrice": amount
             }),
-            "RequestDateTime": current_datetime,
+            "RequestDateTime": self.request_date(),
             "RedirectUrl": payment_data['return_url'],
-            "TransactionData": {
-                "AcceptedPaymentTypes": "",
-                "PaymentType": "",
-                "SurchargeType": "",
-                "SurchargeValue": "",
-                "RefTransactionId": "",
-                "IndustrySpecificationCode": "",
-                "PartialPaymentOption": ""
-            },
-            "OrderAmount": str(payment_data['amount']),
+            # Constant sections are shared between payloads; never mutate them
+            "TransactionData": self.TRANSACTION_DATA,
+            "OrderAmount": amount,
             "OrderType": "ONLINE",
-            "OrderAmountData": {
-                "AmountTypeDesc": "",
-                "Amount": ""
-            },
-            "CustomerData": {
-                "CustomerId": str(payment_data.get('user_id', '')),
-                "CustomerNotes": "Order from YourKirana",
-                "FirstName": payment_data['customer_name'].split()[0] if payment_data['customer_name'] else '',
-                "LastName": ' '.join(payment_data['customer_name'].split()[1:]) if len(payment_data['customer_name'].split()) > 1 else '',
-                "MobileNo": payment_data['customer_phone'],
-                "Email": payment_data['customer_email'],
-                "EmailReceipt": "true",
-                "BillingAddress": "",
-                "BillingCity": "",
-                "BillingState": "",
-                "BillingCountry": "India",
-                "BillingZipCode": "",
-                "ShippingFirstName": payment_data['customer_name'].split()[0] if payment_data['customer_name'] else '',
-                "ShippingLastName": ' '.join(payment_data['customer_name'].split()[1:]) if len(payment_data['customer_name'].split()) > 1 else '',
-                "ShippingAddress": "",
-                "ShippingCity": "",
-                "ShippingState": "",
-                "ShippingCountry": "India",
-                "ShippingZipCode": "",
-                "ShippingMobileNo": payment_data['customer_phone'],
-                "ShippingEmail": payment_data['customer_email']
-            }
+            "OrderAmountData": self.ORDER_AMOUNT_DATA,
+            "CustomerData": customer_data,
         }
+
+
+class PayGPaymentGateway:
+    def __init__(self, config=None):
+        self.config = config or settings.PAYG_CONFIG
+        self.merchant_key_id = self.config['MERCHANT_KEY_ID']
+        self.mid = self.config['MID']
+        # Remove 0x prefix if present
+        self.auth_key = self.config['AUTHENTICATION_KEY']
+        self.auth_token = self.config['AUTHENTICATION_TOKEN']   
+        self.payment_url = self.config['PAYMENT_URL']
+        self.order_status_url = self.config.get('ORDER_STATUS_URL')
+        self.payload_builder = PayGPayloadBuilder(self.mid, self.auth_key, self.auth_token)
+        # (connect, read) so a dead host fails fast but a slow order create is still allowed to finish
+        self.timeout = (
+            self.config.get('CONNECT_TIMEOUT', 5),
+            self.config.get('READ_TIMEOUT', 30),
+        )
+        self.session = self._build_session(self.config.get('POOL_SIZE', 10))
+        self.max_retries = self.config.get('MAX_RETRIES', 2)
+        self.breaker, self.retry_budget, self.status_breaker = get_gateway_guards()
+    
+    def _build_session(self, pool_size):
+        """Keep-alive session so repeated calls reuse the TCP + TLS connection to PayG"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+    
+    def close(self):
+        """Release pooled connections"""
+        self.session.close()
+    
+    def generate_basic_auth(self):
+        """Basic Authentication header for PayG (computed once per config)"""
+        return self.payload_builder.auth_header
+    
+    def build_payment_payload(self, payment_data):
+        """PayG order create payload (see PayGPayloadBuilder.build)"""
+        return self.payload_builder.build(payment_data)
+    
+    def build_headers(self):
+        """Request headers for PayG order API calls (shared, do not mutate)"""
+        return self.payload_builder.headers
+    
+    def parse_payment_response(self, status_code, text):
+        """Turn a raw PayG HTTP response into the {'success', 'data'/'error'} result dict"""
+        logger.debug("payg.response", extra={"status_code": status_code, "body": text})
         
-        # Generate Basic Auth header
-        auth_header = self.generate_basic_auth()
+        if status_code == 200 or status_code == 201:
+            try:
+                response_data = json.loads(text)
+            except ValueError as e:
+                return {
+                    'success': False,
+                    'error': f"Request failed: {str(e)}"
+                }
+            return {
+                'success': True,
+                'data': response_data
+            }
         
-        # Send request to PayG
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': auth_header,
-            'cache-control': 'no-cache'
+        error_detail = text if text else 'No error details provided'
+        return {
+            'success': False,
+            'error': f"Payment gateway error: {status_code}",
+            'data': error_detail
         }
+    
+    def circuit_open_result(self):
+        return {
+            'success': False,
+            'circuit_open': True,
+            'error': "Payment gateway temporarily unavailable"
+        }
+    
+    def breaker_for(self, operation):
+        return self.status_breaker if operation == 'order_status' else self.breaker
+    
+    def record_response(self, status_code, elapsed, operation='order_create'):
+        """Feed one PayG response into the operation's breaker; returns True if it is safe to retry"""
+        PAYG_SECONDS.labels(operation, status_code).observe(elapsed)
+        if status_code >= 500 or status_code == 429:
+            self.breaker_for(operation).record_failure(elapsed)
+        else:
+            self.breaker_for(operation).record_success(elapsed)
+        return status_code in RETRYABLE_STATUS_CODES
+    
+    def record_error(self, elapsed, operation='order_create'):
+        """Feed a PayG call that got no response (connection error, timeout) into the operation's breaker"""
+        PAYG_SECONDS.labels(operation, 'error').observe(elapsed)
+        self.breaker_for(operation).record_failure(elapsed)
+    
+    def should_retry(self, attempt, retryable):
+        return retryable and attempt < self.max_retries and self.retry_budget.withdraw()
+    
+    def create_payment_request(self, payment_data):
+        """
+        Create payment request to PayG (see build_payment_payload for payment_data)
         
-        try:
-            print(f"Sending request to PayG: {self.payment_url}")
-            print(f"Headers: {headers}")
-            print(f"Payload: {json.dumps(payload, indent=2)}")
-            
-            response = requests.post(
-                self.payment_url,
-                json=payload,
-                headers=headers,
-                timeout=30
-            )
-            
-            print(f"Response Status: {response.status_code}")
-            print(f"Response Body: {response.text}")
+        The payload is built once so every retry carries the same
+        UniqueRequestId and PayG can de-duplicate it.
+        """
+        payload = self.build_payment_payload(payment_data)
+        headers = self.build_headers()
+        
+        body = json_dumps(payload)
+        
+        logger.debug("payg.request", extra={"url": self.payment_url, "headers": headers, "payload": payload})
+        
+        self.retry_budget.deposit()
+        attempt = 0
+        while True:
+            if not self.breaker.allow_request():
+                return self.circuit_open_result()
             
-            if response.status_code == 200 or response.status_code == 201:
-                response_data = response.json()
-                return {
-                    'success': True,
-                    'data': response_data
-                }
-            else:
-                error_detail = response.text if response.text else 'No error details provided'
-                return {
+            started = time.monotonic()
+            try:
+                response = self.session.post(
+                    self.payment_url,
+                    data=body,
+                    headers=headers,
+                    timeout=self.timeout
+                )
+            except requests.exceptions.RequestException as e:
+                self.record_error(time.monotonic() - started)
+                result = {
                     'success': False,
-                    'error': f"Payment gateway error: {response.status_code}",
-                    'data': error_detail
+                    'error': f"Request failed: {str(e)}"
                 }
+                retryable = isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+            except BaseException:
+                # No outcome to record, but a half-open breaker must not wait for one forever
+                self.breaker.release()
+                raise
+            else:
+                retryable = self.record_response(response.status_code, time.monotonic() - started)
+                result = self.parse_payment_response(response.status_code, response.text)
+            
+            if not self.should_retry(attempt, retryable):
+                logger.info("payg.order_create", extra={
+                    "order_id": payload["UniqueRequestId"],
+                    "success": result["success"],
+                    "error": result.get("error"),
+                    "attempts": attempt + 1,
+                })
+                return result
+            attempt += 1
+            time.sleep(backoff_delay(attempt, base=self.config.get('RETRY_BACKOFF', 0.2)))
+    
+    def get_order_status(self, payg_order_id):
+        """
+        Fetch PayG's order detail for ``payg_order_id`` (used by reconciliation).
+        
+        Same result dict as create_payment_request. Not retried: a lookup
+        that fails is simply asked again on the next reconciliation run.
+        """
+        if not self.status_breaker.allow_request():
+            return self.circuit_open_result()
+        
+        body = json_dumps({
+            "OrderKeyId": payg_order_id,
+            "MerchantKeyId": self.merchant_key_id,
+            "PaymentType": "",
+        })
+        started = time.monotonic()
+        try:
+            response = self.session.post(
+                self.order_status_url,
+                data=body,
+                headers=self.build_headers(),
+                timeout=self.timeout
+            )
         except requests.exceptions.RequestException as e:
+            self.record_error(time.monotonic() - started, operation='order_status')
             return {
                 'success': False,
                 'error': f"Request failed: {str(e)}"
             }
+        except BaseException:
+            self.status_breaker.release()
+            raise
+        self.record_response(response.status_code, time.monotonic() - started, operation='order_status')
+        return self.parse_payment_response(response.status_code, response.text)
     
     def verify_webhook_signature(self, webhook_data, signature):
         """Verify webhook signature from PayG (if provided)"""
         # Implement if PayG provides signature verification
-        return True
\ No newline at end of file
+        return True
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+_guards = None
+_guards_lock = threading.Lock()
+
+
+def _breaker(name):
+    config = settings.PAYG_CONFIG
+    return CircuitBreaker(
+        name,
+        failure_rate_threshold=config.get('BREAKER_FAILURE_RATE', 0.5),
+        slow_call_seconds=config.get('BREAKER_SLOW_CALL_SECONDS', 5),
+        window_size=config.get('BREAKER_WINDOW', 20),
+        min_calls=config.get('BREAKER_MIN_CALLS', 10),
+        reset_timeout=config.get('BREAKER_RESET_TIMEOUT', 30),
+    )
+
+
+def get_gateway_guards():
+    """
+    Process-wide (CircuitBreaker, RetryBudget, CircuitBreaker) for PayG:
+    order creation's breaker and retry budget, shared by the sync and async
+    clients so both see the same failure history, and a separate breaker for
+    order status lookups, so a reconciliation sweep that trips it does not
+    block checkouts.
+    """
+    global _guards
+    if _guards is None:
+        with _guards_lock:
+            if _guards is None:
+                _guards = (
+                    _breaker('payg'),
+                    RetryBudget(ratio=settings.PAYG_CONFIG.get('RETRY_BUDGET_RATIO', 0.2)),
+                    _breaker('payg_order_status'),
+                )
+    return _guards
+
+
+def gateway_health():
+    """Breaker state and retry counters for the PayG client"""
+    breaker, retry_budget, status_breaker = get_gateway_guards()
+    return {**breaker.snapshot(), **retry_budget.snapshot(), 'order_status': status_breaker.snapshot()}
+
+
+def get_payment_gateway():
+    """Return the process-wide PayG client, creating it on first use"""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = PayGPaymentGateway()
+    return _gateway
+
+
+def close_payment_gateway():
+    """Tear down the shared client (worker shutdown, settings change)"""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is not None:
+            _gateway.close()
+            _gateway = None
+        async_gateways = list(_async_gateways.items())
+        _async_gateways.clear()
+    for loop, gateway in async_gateways:
+        _close_async_gateway(loop, gateway)
+
+
+def _close_async_gateway(loop, gateway):
+    """``aclose()`` an async client on the event loop its connections belong to"""
+    if loop.is_closed():
+        # Nothing can run on a closed loop; its sockets go when collected
+        return
+    if not loop.is_running():
+        loop.run_until_complete(gateway.aclose())
+        return
+    try:
+        current = asyncio.get_running_loop()
+    except RuntimeError:
+        current = None
+    if current is loop:
+        loop.create_task(gateway.aclose())
+    else:
+        asyncio.run_coroutine_threadsafe(gateway.aclose(), loop)
+
+
+atexit.register(close_payment_gateway)
+
+
+class AsyncPayGPaymentGateway(PayGPaymentGateway):
+    """
+    Non-blocking PayG client for the ASGI deployment.
+    
+    Shares payload building and response parsing with PayGPaymentGateway;
+    only the transport differs (a pooled httpx.AsyncClient).
+    """
+    
+    def _build_session(self, pool_size):
+        return httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+            ),
+            timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+        )
+    
+    async def aclose(self):
+        """Release pooled connections"""
+        await self.session.aclose()
+    
+    def close(self):
+        # The AsyncClient is tied to its event loop and is dropped with it
+        pass
+    
+    async def create_payment_request(self, payment_data):
+        payload = self.build_payment_payload(payment_data)
+        headers = self.build_headers()
+        
+        body = json_dumps(payload)
+        
+        logger.debug("payg.request", extra={"url": self.payment_url, "headers": headers, "payload": payload})
+        
+        self.retry_budget.deposit()
+        attempt = 0
+        while True:
+            if not self.breaker.allow_request():
+                return self.circuit_open_result()
+            
+            started = time.monotonic()
+            try:
+                response = await self.session.post(
+                    self.payment_url,
+                    content=body,
+                    headers=headers,
+                )
+            except httpx.HTTPError as e:
+                self.record_error(time.monotonic() - started)
+                result = {
+                    'success': False,
+                    'error': f"Request failed: {str(e)}"
+                }
+                retryable = isinstance(e, httpx.TransportError)
+            except BaseException:
+                # Cancelled (client went away) or unexpected: free a half-open trial
+                self.breaker.release()
+                raise
+            else:
+                retryable = self.record_response(response.status_code, time.monotonic() - started)
+                result = self.parse_payment_response(response.status_code, response.text)
+            
+            if not self.should_retry(attempt, retryable):
+                logger.info("payg.order_create", extra={
+                    "order_id": payload["UniqueRequestId"],
+                    "success": result["success"],
+                    "error": result.get("error"),
+                    "attempts": attempt + 1,
+                })
+                return result
+            attempt += 1
+            await asyncio.sleep(backoff_delay(attempt, base=self.config.get('RETRY_BACKOFF', 0.2)))
+
+
+# One async client per event loop: httpx connections cannot be shared across loops
+_async_gateways = weakref.WeakKeyDictionary()
+
+
+def get_async_payment_gateway():
+    """Return the PayG async client for the running event loop"""
+    loop = asyncio.get_running_loop()
+    gateway = _async_gateways.get(loop)
+    if gateway is None:
+        gateway = _async_gateways[loop] = AsyncPayGPaymentGateway()
+    return gateway
+
+
+def _reset_gateway(setting, **kwargs):
+    global _guards
+    if setting == 'PAYG_CONFIG':
+        close_payment_gateway()
+        _guards = None
+
+
+setting_changed.connect(_reset_gateway)
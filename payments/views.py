@@ -1,25 +1,74 @@
 from rest_framework import status, generics
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.exceptions import AuthenticationFailed
 from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
-import uuid
-
+from django.http import JsonResponse, StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.http import parse_etags
+from django.views import View
+from asgiref.sync import sync_to_async
+import asyncio
+import json
+
+from .cache import cache_status, get_cached_status
+from .export import CONTENT_TYPES, aiter_chunks, export_chunks, export_queryset, parse_filters
 from .models import Payment, PaymentWebhookLog
+from .pagination import PaymentHistoryPagination
+from .reconciliation import RECONCILABLE_STATUSES, reconcile_payment
 from .serializers import (
     PaymentInitiateSerializer,
     PaymentSerializer,
-    PaymentStatusSerializer
+    PaymentStatusSerializer,
+    payment_read_values,
+    serialize_payment_row,
+    serialize_payment_rows,
+)
+from .services import (
+    apply_gateway_result,
+    gateway_payment_data,
+    new_order_id,
+    payment_status_changed,
+    pending_payment_fields,
+    process_webhook,
 )
-from .utils import PayGPaymentGateway
+from .notifier import get_notifier
+from .utils import gateway_health, get_async_payment_gateway, get_payment_gateway
+from yourkirana.db_router import replica_reads
+from accounts.authentication import CachedJWTAuthentication
 import logging
-logger = logging.getLogger("payments    ")
+logger = logging.getLogger("payments")
+
+SSE_KEEPALIVE_SECONDS = 15
 
 
 
+async def authenticate_async(request):
+    """
+    JWT-authenticate a plain (non-DRF) async view.
+
+    Returns ``(user, None)`` or ``(None, JsonResponse)`` with the same 401
+    bodies DRF would send.
+    """
+    try:
+        auth = await sync_to_async(CachedJWTAuthentication().authenticate)(request)
+    except AuthenticationFailed as e:
+        detail = e.detail if isinstance(e.detail, dict) else {"detail": e.detail}
+        return None, JsonResponse(detail, status=status.HTTP_401_UNAUTHORIZED)
+    if auth is None:
+        return None, JsonResponse(
+            {"detail": "Authentication credentials were not provided."},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+    return auth[0], None
+
+
 class InitiatePaymentView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -29,81 +78,62 @@ class InitiatePaymentView(APIView):
 
         user = request.user
         amount = serializer.validated_data["amount"]
-
-        # 🔑 Internal order ID (YOUR system)
-        order_id = f"YK{uuid.uuid4().hex[:12].upper()}"
+        order_id = new_order_id()
 
         # 1️⃣ Create pending payment FIRST
-        payment = Payment.objects.create(
-            user=user,
-            order_id=order_id,
-            amount=amount,
-            customer_name=user.full_name,
-            customer_email=user.email,
-            customer_phone=user.phone or "9999999999",
-            status="PENDING",
+        payment = Payment.objects.create(**pending_payment_fields(user, order_id, amount))
+
+        payment_gateway = get_payment_gateway()
+        result = payment_gateway.create_payment_request(
+            gateway_payment_data(user, order_id, amount)
         )
 
-        payment_gateway = PayGPaymentGateway()
-
-        payment_data = {
-            "order_id": order_id,
-            "amount": float(amount),
-            "customer_name": user.full_name,
-            "customer_email": user.email,
-            "customer_phone": user.phone or "9999999999",
-            "user_id": str(user.id),
-            "callback_url": settings.PAYG_CONFIG["CALLBACK_URL"],
-            "return_url": settings.PAYG_CONFIG["RETURN_URL"],
-        }
-
-        result = payment_gateway.create_payment_request(payment_data)
-
-        # ❌ Payment gateway failure
-        if not result.get("success"):
-            payment.status = "FAILED"
-            payment.payment_gateway_response = result
-            payment.save()
-
-            return Response(
-                {
-                    "success": False,
-                    "message": "Payment initiation failed",
-                },
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+        body, status_code = apply_gateway_result(payment, result)
+        payment.save()
+        payment_status_changed(payment)
 
-        # 🔴 VERY IMPORTANT PART 🔴
-        payg_data = result.get("data", {})
-        payg_order_id = payg_data.get("OrderKeyId")
-
-        if not payg_order_id:
-            payment.status = "FAILED"
-            payment.payment_gateway_response = result
-            payment.save()
-
-            return Response(
-                {
-                    "success": False,
-                    "message": "Invalid PayG response (OrderKeyId missing)",
-                },
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+        return Response(body, status=status_code)
 
-        # ✅ SAVE PayG OrderKeyId (WEBHOOK KEY)
-        payment.payg_order_id = payg_order_id
-        payment.payment_gateway_response = payg_data
-        payment.save()
 
-        return Response(
-            {
-                "success": True,
-                "order_id": order_id,
-                "payment_url": payg_data.get("PaymentProcessUrl"),
-            },
-            status=status.HTTP_200_OK,
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncInitiatePaymentView(View):
+    """
+    InitiatePaymentView for the ASGI deployment.
+
+    The PayG call and the ORM writes are awaited, so one worker can keep
+    many gateway calls in flight instead of blocking a thread per call.
+    """
+
+    async def post(self, request):
+        user, error_response = await authenticate_async(request)
+        if error_response is not None:
+            return error_response
+
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            return JsonResponse({"detail": "JSON parse error"}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = PaymentInitiateSerializer(data=data)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        amount = serializer.validated_data["amount"]
+        order_id = new_order_id()
+
+        payment = await Payment.objects.acreate(**pending_payment_fields(user, order_id, amount))
+
+        payment_gateway = get_async_payment_gateway()
+        result = await payment_gateway.create_payment_request(
+            gateway_payment_data(user, order_id, amount)
         )
 
+        body, status_code = apply_gateway_result(payment, result)
+        await payment.asave()
+        await sync_to_async(payment_status_changed)(payment)
+
+        return JsonResponse(body, status=status_code)
+
 
 @method_decorator(csrf_exempt, name="dispatch")
 class PaymentWebhookView(APIView):
@@ -111,167 +141,175 @@ class PaymentWebhookView(APIView):
     
     def post(self, request):
         data = request.data
-        
-        # 🔍 LOG EVERYTHING FOR DEBUGGING
-        logger.info("=" * 50)
-        logger.info("WEBHOOK RECEIVED - FULL DATA:")
-        logger.info(f"Data: {data}")
-        logger.info("=" * 50)
-
-        # 1. Create webhook log entry FIRST (even if processing fails)
-        webhook_log = PaymentWebhookLog.objects.create(
+        logger.debug("webhook.received", extra={"webhook": data})
+
+        if not isinstance(data, dict):
+            # A JSON list or scalar: keep it for inspection, there is nothing to apply
+            PaymentWebhookLog.objects.create(webhook_data=data, processed=False, last_error="Invalid payload")
+            logger.warning("webhook.invalid_payload", extra={"payload_type": type(data).__name__})
+            return Response({"success": False, "error": "Invalid payload"}, status=400)
+
+        # 1. Webhook log entry: written once, in its final state (even if processing fails)
+        webhook_log = PaymentWebhookLog(
             webhook_data=data,
+            order_key_id=str(data.get("OrderKeyId") or ""),
             processed=False
         )
-        logger.info(f"📝 Webhook log created: ID {webhook_log.id}")
 
-        try:
-            # 2. Get PayG Order ID
-            payg_order_id = data.get("OrderKeyId")
-            if not payg_order_id:
-                logger.error("❌ OrderKeyId missing in webhook")
-                webhook_log.processed = False
-                webhook_log.save()
-                return Response({"success": False, "error": "Missing OrderKeyId"}, status=400)
-
-            # 3. Find payment by PayG Order ID
-            payment = Payment.objects.filter(payg_order_id=payg_order_id).first()
-            if not payment:
-                logger.error(f"❌ Payment not found for OrderKeyId: {payg_order_id}")
-                webhook_log.processed = False
-                webhook_log.save()
-                return Response({"success": False, "error": "Payment not found"}, status=404)
-
-            # Link webhook log to payment
-            webhook_log.payment = payment
+        # Queue mode: ack PayG now, process_webhooks applies it in the background
+        if settings.PAYMENT_WEBHOOK_MODE == "queue":
             webhook_log.save()
-            logger.info(f"🔗 Webhook log linked to payment: {payment.order_id}")
-
-            # 4. Idempotency: already processed
-            if payment.status == "SUCCESS":
-                logger.info(f"✅ Payment already processed: {payg_order_id}")
-                webhook_log.processed = True
-                webhook_log.save()
-                return Response({"success": True, "message": "Already processed"}, status=200)
-
-            # 5. Extract payment details from PayG webhook
-            payment_status = data.get("PaymentStatus")
-            payment_response_text = data.get("PaymentResponseText", "").lower()
-            order_payment_status_text = data.get("OrderPaymentStatusText", "").lower()
-            
-            logger.info(f"Payment Status Code: {payment_status}")
-            logger.info(f"Payment Response Text: {payment_response_text}")
-            logger.info(f"Order Payment Status Text: {order_payment_status_text}")
-
-            # 6. Determine if payment is successful
-            is_success = (
-                payment_status == 1 or 
-                "approved" in payment_response_text or 
-                "paid" in order_payment_status_text or
-                "success" in payment_response_text
-            )
+            logger.info("webhook.queued", extra={"webhook_log_id": webhook_log.id})
+            return Response({"success": True, "message": "Webhook queued"}, status=200)
 
-            if is_success:
-                payment.status = "SUCCESS"
-                payment.payment_completed_at = timezone.now()
-                logger.info(f"✅ Payment marked as SUCCESS: {payment.order_id}")
-            else:
-                payment.status = "FAILED"
-                logger.warning(f"⚠️ Payment marked as FAILED: {payment.order_id}")
-
-            # 7. Map PayG payment method to your choices
-            payg_payment_method = data.get("PaymentMethod", "").upper()
-            payment_method_mapping = {
-                "UPI": "UPI",
-                "DEBIT CARD": "DEBIT_CARD",
-                "CREDIT CARD": "CREDIT_CARD",
-                "DEBITCARD": "DEBIT_CARD",
-                "CREDITCARD": "CREDIT_CARD",
-                "NET BANKING": "NET_BANKING",
-                "NETBANKING": "NET_BANKING",
-                "WALLET": "WALLET",
-            }
-            payment.payment_method = payment_method_mapping.get(
-                payg_payment_method, 
-                "UPI"  # Default fallback
-            )
-
-            # 8. Save transaction details
-            payment.transaction_id = (
-                data.get("PaymentTransactionId") or 
-                data.get("PaymentTransactionRefNo") or
-                data.get("TransactionId")
+        try:
+            body, status_code = process_webhook(webhook_log)
+            return Response(body, status=status_code)
+        except Exception:
+            logger.exception("webhook.error", extra={"order_key_id": webhook_log.order_key_id})
+            # The processing transaction rolled back; keep the raw webhook for retry
+            PaymentWebhookLog.objects.create(
+                webhook_data=data,
+                order_key_id=webhook_log.order_key_id,
+                processed=False
             )
-            
-            # Save the full webhook response
-            payment.webhook_response = data
-            
-            # Save the payment
-            payment.save()
-
-            # Mark webhook as processed
-            webhook_log.processed = True
-            webhook_log.save()
-
-            logger.info(f"💾 Payment updated successfully:")
-            logger.info(f"   Order ID: {payment.order_id}")
-            logger.info(f"   Status: {payment.status}")
-            logger.info(f"   Transaction ID: {payment.transaction_id}")
-            logger.info(f"   Payment Method: {payment.payment_method}")
-            logger.info(f"   Amount: {payment.amount}")
-
-            return Response({
-                "success": True, 
-                "message": "Payment updated successfully",
-                "order_id": payment.order_id,
-                "status": payment.status
-            }, status=200)
-
-        except Exception as e:
-            logger.error(f"❌ Exception in webhook processing: {str(e)}")
-            logger.exception(e)
-            webhook_log.processed = False
-            webhook_log.save()
             return Response({
                 "success": False, 
                 "error": "Internal server error"
             }, status=500)
 
 
-
-
-
-
-
-
 class PaymentStatusView(APIView):
+    # Polled: CachedJWTAuthentication (the default) answers from its user cache
     permission_classes = [IsAuthenticated]
     
     def get(self, request, order_id):
+        cached = get_cached_status(order_id, request.user.pk)
+        if cached is None:
+            with replica_reads(request.user.pk):
+                row = payment_read_values(
+                    Payment.objects.filter(order_id=order_id, user_id=request.user.pk)
+                ).first()
+            if row is None:
+                return Response({
+                    'success': False,
+                    'error': 'Payment not found'
+                }, status=status.HTTP_404_NOT_FOUND)
+            cached = cache_status(order_id, request.user.pk, serialize_payment_row(row))
+
+        payment_data, etag = cached
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and (if_none_match.strip() == '*' or etag in parse_etags(if_none_match)):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        return Response({
+            'success': True,
+            'payment': payment_data
+        }, status=status.HTTP_200_OK, headers={'ETag': etag})
+
+class PaymentWaitView(View):
+    """
+    Long-poll / server-sent-events alternative to polling PaymentStatusView.
+
+    Holds the request until the payment leaves PENDING (woken by webhook
+    processing through the PAYMENT_NOTIFIER backend) or ``timeout`` seconds
+    pass, then answers with the same payload as PaymentStatusView. With
+    ``Accept: text/event-stream`` the current status is streamed first,
+    followed by the final one, with keep-alive comments in between.
+    """
+
+    async def get(self, request, order_id):
+        user, error_response = await authenticate_async(request)
+        if error_response is not None:
+            return error_response
+
         try:
-            payment = Payment.objects.get(
-                order_id=order_id,
-                user=request.user
-            )
-            
-            serializer = PaymentSerializer(payment)
-            return Response({
-                'success': True,
-                'payment': serializer.data
-            }, status=status.HTTP_200_OK)
-            
-        except Payment.DoesNotExist:
-            return Response({
-                'success': False,
-                'error': 'Payment not found'
+            timeout = float(request.GET.get("timeout", settings.PAYMENT_WAIT_MAX_TIMEOUT))
+        except ValueError:
+            timeout = settings.PAYMENT_WAIT_MAX_TIMEOUT
+        timeout = max(0.0, min(timeout, settings.PAYMENT_WAIT_MAX_TIMEOUT))
+
+        queryset = payment_read_values(Payment.objects.filter(order_id=order_id, user=user))
+
+        # Subscribe before reading so a webhook landing in between still wakes us
+        subscription = await get_notifier().subscribe(order_id)
+        try:
+            row = await queryset.afirst()
+        except BaseException:
+            subscription.close()
+            raise
+        if row is None:
+            subscription.close()
+            return JsonResponse({
+                "success": False,
+                "error": "Payment not found"
             }, status=status.HTTP_404_NOT_FOUND)
 
+        if "text/event-stream" in request.headers.get("Accept", ""):
+            response = StreamingHttpResponse(
+                self.event_stream(subscription, queryset, row, timeout),
+                content_type="text/event-stream",
+            )
+            response["Cache-Control"] = "no-cache"
+            response["X-Accel-Buffering"] = "no"
+            return response
+
+        try:
+            # A notify can be a duplicate or no-op webhook: re-check and keep
+            # waiting until the payment leaves PENDING or the time is up
+            deadline = asyncio.get_running_loop().time() + timeout
+            while row["status"] == "PENDING":
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0 or not await subscription.wait(remaining):
+                    break
+                row = await queryset.afirst() or row
+        finally:
+            subscription.close()
+
+        return JsonResponse({
+            "success": True,
+            "payment": serialize_payment_row(row),
+            "pending": row["status"] == "PENDING",
+        }, status=status.HTTP_200_OK)
+
+    async def event_stream(self, subscription, queryset, row, timeout):
+        try:
+            yield self.sse_event(row)
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout
+            while row["status"] == "PENDING":
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                if await subscription.wait(min(remaining, SSE_KEEPALIVE_SECONDS)):
+                    latest = await queryset.afirst() or row
+                    if latest != row:
+                        row = latest
+                        yield self.sse_event(row)
+                    continue
+                yield ": keep-alive\n\n"
+            yield "event: end\ndata: {}\n\n"
+        finally:
+            subscription.close()
+
+    def sse_event(self, row):
+        data = json.dumps(serialize_payment_row(row), cls=DjangoJSONEncoder)
+        return f"event: status\ndata: {data}\n\n"
+
+
 class PaymentHistoryView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = PaymentSerializer
+    pagination_class = PaymentHistoryPagination
     
     def get_queryset(self):
-        return Payment.objects.filter(user=self.request.user)
+        return payment_read_values(Payment.objects.filter(user_id=self.request.user.pk))
+
+    def list(self, request, *args, **kwargs):
+        # .values() rows + plain-dict encoding; same JSON as PaymentSerializer
+        with replica_reads(request.user.pk):
+            page = self.paginate_queryset(self.get_queryset())
+        return self.get_paginated_response(serialize_payment_rows(page))
 
 class PaymentVerifyView(APIView):
     permission_classes = [IsAuthenticated]
@@ -286,22 +324,70 @@ class PaymentVerifyView(APIView):
                 'error': 'Order ID is required'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        try:
-            payment = Payment.objects.get(
-                order_id=order_id,
-                user=request.user
-            )
-            
-            # TODO: Call PayG API to verify payment status
-            # This depends on PayG's API documentation
-            
-            return Response({
-                'success': True,
-                'payment': PaymentSerializer(payment).data
-            }, status=status.HTTP_200_OK)
-            
-        except Payment.DoesNotExist:
+        row = payment_read_values(
+            Payment.objects.filter(order_id=order_id, user=request.user)
+        ).first()
+        if row is None:
             return Response({
                 'success': False,
                 'error': 'Payment not found'
-            }, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        # Webhook not in yet: ask PayG directly and apply a settled outcome
+        if row['status'] in RECONCILABLE_STATUSES:
+            payment = Payment.objects.get(pk=row['id'])
+            reconcile_payment(payment)
+            if payment.status != row['status']:
+                row = payment_read_values(Payment.objects.filter(pk=payment.pk)).first()
+
+        return Response({
+            'success': True,
+            'payment': serialize_payment_row(row)
+        }, status=status.HTTP_200_OK)
+
+
+class GatewayHealthView(APIView):
+    """PayG circuit breaker state and retry counters, for monitoring/alerting"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(gateway_health(), status=status.HTTP_200_OK)
+
+
+class PaymentExportView(APIView):
+    """
+    Streaming CSV/JSONL export for finance (staff only; an admin session
+    works too). Query parameters: fmt=csv|jsonl, from, to (ISO date or
+    datetime, ``to`` exclusive), status and method (comma-separated or
+    repeated). See payments.export.
+    """
+    authentication_classes = [CachedJWTAuthentication, SessionAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        fmt = request.query_params.get('fmt', 'csv')
+        if fmt not in CONTENT_TYPES:
+            return Response({'error': f"fmt must be one of: {', '.join(CONTENT_TYPES)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            filters = parse_filters(
+                request.query_params.get('from'),
+                request.query_params.get('to'),
+                request.query_params.getlist('status'),
+                request.query_params.getlist('method'),
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        logger.info("payment.export", extra={
+            "user_id": str(request.user.pk),
+            "format": fmt,
+            "filters": {key: value for key, value in filters.items() if value},
+        })
+        chunks = export_chunks(export_queryset(**filters), fmt)
+        if isinstance(request._request, ASGIRequest):
+            chunks = aiter_chunks(chunks)
+        response = StreamingHttpResponse(chunks, content_type=CONTENT_TYPES[fmt])
+        filename = f"payments-{timezone.now():%Y%m%d-%H%M%S}.{fmt}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
@@ -0,0 +1,77 @@
+"""
+Read-replica routing.
+
+Reads are sent to the ``replica`` alias only inside a ``replica_reads()``
+block (read-only views such as payment history/status and the admin
+changelist). Everything else, and every write, stays on ``default``.
+
+After a user's own write (``mark_write``) their reads stick to the primary
+for REPLICA_STICKY_SECONDS, so replication lag can never show them a
+just-paid order as pending. The markers live in the shared
+REPLICA_STICKY_CACHE_ALIAS cache so that every worker honours them.
+
+``migrate`` never touches the replica: its schema comes from the primary.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+
+REPLICA_DB_ALIAS = 'replica'
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def replica_configured():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+def _sticky_key(user_id):
+    return f"db-sticky:{user_id}"
+
+
+def mark_write(user_id):
+    """Pin ``user_id``'s reads to the primary for the sticky window"""
+    if user_id is not None and replica_configured():
+        caches[settings.REPLICA_STICKY_CACHE_ALIAS].set(
+            _sticky_key(user_id), True, timeout=settings.REPLICA_STICKY_SECONDS
+        )
+
+
+def recently_wrote(user_id):
+    return bool(caches[settings.REPLICA_STICKY_CACHE_ALIAS].get(_sticky_key(user_id)))
+
+
+@contextmanager
+def replica_reads(user_id=None):
+    """Route reads in this block to the replica, unless ``user_id`` wrote recently"""
+    if not replica_configured() or (user_id is not None and recently_wrote(user_id)):
+        yield
+        return
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get():
+            return REPLICA_DB_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same data on both aliases
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary through replication
+        if db == REPLICA_DB_ALIAS:
+            return False
+        return None
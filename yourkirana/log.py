@@ -0,0 +1,106 @@
+"""
+Structured, non-blocking logging.
+
+Request threads only enqueue records (``AsyncStreamHandler``); a background
+``QueueListener`` thread renders them as one JSON object per line
+(``JsonFormatter``) and writes them out. Secrets in structured ``extra``
+fields are redacted before anything is written.
+
+    logger.info("webhook.processed", extra={"order_id": order_id, "status": status})
+"""
+import json
+import logging
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+REDACTED = "[redacted]"
+
+# Any extra/nested key containing one of these (case-insensitive) is masked
+SENSITIVE_KEY_PARTS = (
+    "authorization",
+    "authentication",
+    "password",
+    "secret",
+    "token",
+    "cookie",
+    "card",
+    "cvv",
+)
+
+# Attributes every LogRecord has; anything else came in through ``extra``
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def is_sensitive(key):
+    key = str(key).lower()
+    return any(part in key for part in SENSITIVE_KEY_PARTS)
+
+
+def redact(value):
+    """Copy of ``value`` with sensitive dict entries masked, at any depth"""
+    if isinstance(value, dict):
+        return {k: REDACTED if is_sensitive(k) else redact(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, event, extra fields, exc"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = REDACTED if is_sensitive(key) else redact(value)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class AsyncStreamHandler(QueueHandler):
+    """
+    Hands records to a bounded queue drained by a QueueListener thread that
+    writes JSON lines to ``stream``. When the queue is full the record is
+    dropped (and counted) rather than blocking the request.
+    """
+
+    def __init__(self, stream=None, queue_size=10000):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        target = logging.StreamHandler(stream or sys.stdout)
+        target.setFormatter(JsonFormatter())
+        self.dropped = 0
+        self.listener = QueueListener(self.queue, target, respect_handler_level=True)
+        self.listener.start()
+
+    def prepare(self, record):
+        # Resolve the message and traceback text now: args and the exception
+        # may change after this call returns. Extra fields are kept as-is.
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        # Called by logging.shutdown() at exit: flush what is still queued
+        if self.listener._thread is not None:
+            self.listener.stop()
+        super().close()
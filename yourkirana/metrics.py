@@ -0,0 +1,143 @@
+"""
+Prometheus metrics.
+
+``MetricsMiddleware`` records, per resolved view, request latency and the
+number and total time of DB queries (counted by a wrapper installed on every
+DB connection). PayG call latency/status and webhook processing lag are
+recorded where they happen (payments.utils, payments.services).
+
+``metrics_view`` serves them in the Prometheus text format, to scrapers
+presenting METRICS_AUTH_TOKEN (to anyone with DEBUG and no token). Under
+gunicorn, point PROMETHEUS_MULTIPROC_DIR at an empty directory before the
+workers start (clear it on every deploy): each worker then writes its samples there
+and /metrics aggregates all workers, whichever one answers the scrape. Call
+``prometheus_client.multiprocess.mark_process_dead(worker.pid)`` from the
+gunicorn ``child_exit`` hook.
+"""
+import hmac
+import os
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotFound
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Request latency", ["view", "method", "status"],
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries", "DB queries per request", ["view"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Time spent in DB queries per request", ["view"],
+)
+PAYG_SECONDS = Histogram(
+    "payg_request_duration_seconds", "Outbound PayG call latency", ["operation", "status"],
+)
+# With PAYMENT_WEBHOOK_MODE="queue" this is observed in ``manage.py
+# process_webhooks``, not in a web worker. The command's samples only reach
+# /metrics when it runs with the same PROMETHEUS_MULTIPROC_DIR as the web
+# workers (same host, shared directory); otherwise they stay in the command's
+# own process and queue-mode lag is never scraped.
+WEBHOOK_LAG_SECONDS = Histogram(
+    "payment_webhook_lag_seconds", "PaymentWebhookLog.created_at to processed",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600),
+)
+
+# [query count, query seconds] of the current request, if it is measured
+_db_stats = ContextVar("metrics_db_stats", default=None)
+
+
+def _count_queries(execute, sql, params, many, context):
+    stats = _db_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats[0] += 1
+        stats[1] += time.perf_counter() - started
+
+
+def _install_query_counter(sender, connection, **kwargs):
+    # The ContextVar follows the request into sync_to_async threads, so this
+    # works for connections opened by async views too
+    if _count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_queries)
+
+
+connection_created.connect(_install_query_counter)
+
+
+class MetricsMiddleware:
+    """Put first in MIDDLEWARE so the whole stack is timed"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = [0, 0.0]
+        token = _db_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _db_stats.reset(token)
+        self.observe(request, response, stats, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        stats = [0, 0.0]
+        token = _db_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _db_stats.reset(token)
+        self.observe(request, response, stats, time.perf_counter() - started)
+        return response
+
+    def observe(self, request, response, stats, elapsed):
+        match = getattr(request, "resolver_match", None)
+        # Unresolved paths share one label, so scanners cannot blow up cardinality
+        view = match.view_name if match else "unresolved"
+        REQUEST_SECONDS.labels(view, request.method, response.status_code).observe(elapsed)
+        REQUEST_DB_QUERIES.labels(view).observe(stats[0])
+        REQUEST_DB_SECONDS.labels(view).observe(stats[1])
+
+
+def metrics_view(request):
+    """All metrics in the Prometheus text format (aggregated across workers in multiprocess mode)"""
+    token = settings.METRICS_AUTH_TOKEN
+    if not token:
+        # Fail closed: without a token only a DEBUG server exposes metrics
+        if not settings.DEBUG:
+            return HttpResponseNotFound()
+    elif not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponseForbidden()
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
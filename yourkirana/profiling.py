@@ -0,0 +1,161 @@
+"""
+Opt-in sampling profiler for slow requests.
+
+With ``REQUEST_PROFILING['ENABLED']``, ``ProfilingMiddleware`` profiles a
+random SAMPLE_RATE share of requests under PATH_PREFIXES with cProfile and
+records the SQL they ran. Sampled requests that took at least SLOW_MS are
+saved as JSON to DIR, which is kept to the newest MAX_PROFILES files (a ring
+buffer); the rest are thrown away. Requests that are not sampled cost one
+random() call.
+
+Only sync requests are profiled: cProfile follows one thread, and an async
+view's work is spread over the event loop and sync_to_async threads.
+
+Saved profiles are listed at /admin/profiles/ (staff only).
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import time
+import uuid
+from contextlib import ExitStack
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib import admin
+from django.db import connections
+from django.http import Http404
+from django.template.response import TemplateResponse
+from django.utils import timezone
+
+# Functions per profile, by cumulative time
+PROFILE_TOP_FUNCTIONS = 60
+
+
+def profiling_config():
+    return settings.REQUEST_PROFILING
+
+
+class ProfilingMiddleware:
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.get_response(request)
+        config = profiling_config()
+        if not (
+            config['ENABLED']
+            and random.random() < config['SAMPLE_RATE']
+            and request.path.startswith(tuple(config['PATH_PREFIXES']))
+        ):
+            return self.get_response(request)
+        return self.profile(request, config)
+
+    def profile(self, request, config):
+        queries = []
+
+        def record_sql(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries.append({"sql": sql, "ms": round((time.perf_counter() - started) * 1000, 3)})
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(record_sql))
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler (e.g. a debugger) owns this thread
+                return self.get_response(request)
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        if duration_ms >= config['SLOW_MS']:
+            match = getattr(request, 'resolver_match', None)
+            save_profile(config, {
+                "method": request.method,
+                "path": request.path,
+                "view": match.view_name if match else None,
+                "status": response.status_code,
+                "duration_ms": round(duration_ms, 1),
+                "created_at": timezone.now().isoformat(),
+                "sql": queries,
+                "stats": format_stats(profiler),
+            })
+        return response
+
+
+def format_stats(profiler):
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_TOP_FUNCTIONS)
+    return stream.getvalue()
+
+
+def save_profile(config, profile):
+    """Write ``profile`` atomically, then drop the oldest files beyond MAX_PROFILES"""
+    directory = Path(config['DIR'])
+    directory.mkdir(parents=True, exist_ok=True)
+    # Sortable by time, unique across processes
+    profile_id = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+    profile["id"] = profile_id
+    tmp_path = directory / f".{profile_id}.tmp"
+    tmp_path.write_text(json.dumps(profile))
+    os.replace(tmp_path, directory / f"{profile_id}.json")
+
+    for stale in list_profile_files(directory)[config['MAX_PROFILES']:]:
+        stale.unlink(missing_ok=True)
+
+
+def list_profile_files(directory):
+    """Profile files, newest first"""
+    return sorted(Path(directory).glob("*.json"), reverse=True)
+
+
+def profiles_view(request, profile_id=None):
+    """Admin page: saved profiles, or one profile's SQL and call stats"""
+    config = profiling_config()
+    directory = config['DIR']
+    context = {
+        **admin.site.each_context(request),
+        "title": "Slow request profiles",
+        "enabled": config['ENABLED'],
+    }
+    if profile_id is None:
+        profiles = []
+        for path in list_profile_files(directory):
+            try:
+                profile = json.loads(path.read_text())
+            except (OSError, ValueError):
+                # Pruned or being replaced by another worker
+                continue
+            profile["sql_count"] = len(profile.pop("sql"))
+            profile.pop("stats")
+            profiles.append(profile)
+        context["profiles"] = profiles
+    else:
+        path = Path(directory) / f"{Path(profile_id).name}.json"
+        try:
+            context["profile"] = json.loads(path.read_text())
+        except (OSError, ValueError):
+            raise Http404("Profile not found (it may have been rotated out)")
+    return TemplateResponse(request, "admin/request_profiles.html", context)
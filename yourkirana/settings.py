@@ -13,6 +13,7 @@ import os
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 
 load_dotenv() 
 
@@ -43,6 +44,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
     
     # Local apps
@@ -51,6 +53,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yourkirana.metrics.MetricsMiddleware',
+    'yourkirana.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,7 +69,7 @@ ROOT_URLCONF = 'yourkirana.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
+        'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -83,13 +87,189 @@ WSGI_APPLICATION = 'yourkirana.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_PROFILE selects the database setup:
+#   sqlite      - local development default
+#   sqlite-wal  - single-box production: WAL journal, IMMEDIATE write
+#                 transactions, busy timeout and larger page cache / mmap,
+#                 applied on every new connection
+#   postgres    - PostgreSQL (requires psycopg) with persistent, health-checked connections
+DB_PROFILE = os.getenv('DB_PROFILE', 'sqlite')
+
+SQLITE_PATH = os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3')
+
+if DB_PROFILE == 'postgres':
+    try:
+        import psycopg  # noqa: F401
+    except ImportError:
+        raise ImproperlyConfigured(
+            "DB_PROFILE='postgres' needs psycopg (pip install -r requirements.txt)"
+        ) from None
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'yourkirana'),
+            'USER': os.getenv('DB_USER', 'yourkirana'),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': 5,
+            },
+        }
+    }
+elif DB_PROFILE == 'sqlite-wal':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': SQLITE_PATH,
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 600)),
+            'OPTIONS': {
+                # Seconds to wait on a locked database (sqlite busy_timeout)
+                'timeout': 20,
+                # Take the write lock at BEGIN so transactions never deadlock upgrading it
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA mmap_size=134217728;'
+                    'PRAGMA cache_size=-20000;'
+                    'PRAGMA temp_store=MEMORY;'
+                ),
+            },
+        }
+    }
+elif DB_PROFILE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': SQLITE_PATH,
+        }
     }
+else:
+    # A typo must not quietly run production on a local SQLite file
+    raise ImproperlyConfigured(
+        f"Unknown DB_PROFILE {DB_PROFILE!r}: expected 'sqlite', 'sqlite-wal' or 'postgres'"
+    )
+
+# Optional read replica for read-only views (see yourkirana/db_router.py).
+# Locally, SQLITE_REPLICA_PATH can point at a copy of the SQLite file.
+if DB_PROFILE == 'postgres' and os.getenv('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.getenv('DB_REPLICA_HOST'),
+        'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+elif DB_PROFILE != 'postgres' and os.getenv('SQLITE_REPLICA_PATH'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('SQLITE_REPLICA_PATH'),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['yourkirana.db_router.ReplicaRouter']
+
+# After a user's own write, their reads stay on the primary this long. The
+# marker lives in the 'replica_sticky' cache (see CACHES), which must be
+# shared by every worker (Redis/Memcached): with a per-process cache, a
+# write handled by one worker does not keep another off the replica.
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 10))
+REPLICA_STICKY_CACHE_ALIAS = 'replica_sticky'
+
+# Logging
+# https://docs.djangoproject.com/en/6.0/topics/logging/
+# One JSON line per event, written by a background thread (see yourkirana/log.py)
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'async_json': {
+            '()': 'yourkirana.log.AsyncStreamHandler',
+            'stream': 'ext://sys.stdout',
+        },
+    },
+    'loggers': {
+        'payments': {
+            'handlers': ['async_json'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+        'accounts': {
+            'handlers': ['async_json'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+    },
 }
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # PaymentStatusView polling cache. LocMemCache evicts least-recently-used
+    # entries past MAX_ENTRIES; point it at Redis/Memcached for multi-worker sharing.
+    'payment_status': {
+        'BACKEND': os.getenv('PAYMENT_STATUS_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('PAYMENT_STATUS_CACHE_LOCATION', 'payment-status'),
+        'TIMEOUT': int(os.getenv('PAYMENT_STATUS_CACHE_TTL', 5)),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # CachedJWTAuthentication's resolved users. Entries are dropped on save in
+    # this process; with a per-process cache other workers see a change after
+    # at most TIMEOUT seconds.
+    'auth_users': {
+        'BACKEND': os.getenv('AUTH_USER_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('AUTH_USER_CACHE_LOCATION', 'auth-users'),
+        'TIMEOUT': int(os.getenv('AUTH_USER_CACHE_TTL', 60)),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # db_router read-your-writes markers; must be shared across workers
+    # when a replica is configured (checked below)
+    'replica_sticky': {
+        'BACKEND': os.getenv('REPLICA_STICKY_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('REPLICA_STICKY_CACHE_LOCATION', 'replica-sticky'),
+    },
+}
+
+PAYMENT_STATUS_CACHE_ALIAS = 'payment_status'
+AUTH_USER_CACHE_ALIAS = 'auth_users'
+
+# With a replica, read-your-writes needs the sticky markers in a shared cache.
+# REPLICA_SINGLE_PROCESS=True accepts the per-process default (runserver).
+if (
+    'replica' in DATABASES
+    and CACHES[REPLICA_STICKY_CACHE_ALIAS]['BACKEND'].endswith('.LocMemCache')
+    and os.getenv('REPLICA_SINGLE_PROCESS', 'False') != 'True'
+):
+    raise ImproperlyConfigured(
+        "A read replica is configured but REPLICA_STICKY_CACHE_BACKEND is a per-process "
+        "LocMemCache; point it (and REPLICA_STICKY_CACHE_LOCATION) at a shared cache, "
+        "or set REPLICA_SINGLE_PROCESS=True for a single-process deployment"
+    )
+
+# Wakes PaymentWaitView (long-poll/SSE) when a webhook settles a payment.
+# InProcessNotifier only reaches waiters in the same worker; use
+# payments.notifier.CacheNotifier with a shared cache across processes.
+PAYMENT_NOTIFIER = {
+    'BACKEND': os.getenv('PAYMENT_NOTIFIER_BACKEND', 'payments.notifier.InProcessNotifier'),
+    'OPTIONS': {},
+}
+
+# Upper bound (seconds) a client may hold PaymentWaitView open
+PAYMENT_WAIT_MAX_TIMEOUT = 30
+
 AUTH_USER_MODEL = 'accounts.User'
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -109,6 +289,54 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# PASSWORD_HASHER_PROFILE=argon2 hashes new passwords with Argon2 (needs
+# argon2-cffi). PBKDF2 stays listed, so existing hashes still verify and are
+# upgraded to the first hasher on the user's next login.
+PASSWORD_HASHER_PROFILE = os.getenv('PASSWORD_HASHER_PROFILE', 'pbkdf2')
+
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'accounts.hashing.TunedArgon2PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+if PASSWORD_HASHER_PROFILE == 'argon2':
+    PASSWORD_HASHERS.insert(0, PASSWORD_HASHERS.pop(2))
+
+# Each running Argon2 hash holds MEMORY_COST KiB, so hashing needs up to
+# PASSWORD_HASHING['WORKERS'] x MEMORY_COST per server process (queued
+# requests allocate nothing): 100 MiB x cpu_count by default. Each hash uses
+# PARALLELISM threads; the pool already runs one hash per core, so keep
+# WORKERS x PARALLELISM at about the core count.
+PASSWORD_ARGON2 = {
+    'TIME_COST': int(os.getenv('PASSWORD_ARGON2_TIME_COST', 2)),
+    'MEMORY_COST': int(os.getenv('PASSWORD_ARGON2_MEMORY_COST', 102400)),  # KiB
+    'PARALLELISM': int(os.getenv('PASSWORD_ARGON2_PARALLELISM', 1)),
+}
+
+# Login/registration hashing pool (accounts.hashing): requests beyond
+# WORKERS running + MAX_PENDING queued get 429
+PASSWORD_HASHING = {
+    'WORKERS': int(os.getenv('PASSWORD_HASHING_WORKERS', os.cpu_count() or 1)),
+    'MAX_PENDING': int(os.getenv('PASSWORD_HASHING_MAX_PENDING', 2 * (os.cpu_count() or 1))),
+}
+
+# Token-bucket limits on login and registration (accounts.throttling), per
+# client IP and per submitted email: 'N/period' allows bursts of N and
+# refills N per period. MemoryBucketStore counts per worker; use
+# accounts.throttling.CacheBucketStore with a shared cache (OPTIONS
+# {'CACHE_ALIAS': ...}) to enforce one limit across workers.
+AUTH_THROTTLE = {
+    'BACKEND': os.getenv('AUTH_THROTTLE_BACKEND', 'accounts.throttling.MemoryBucketStore'),
+    'OPTIONS': {},
+    'RATES': {
+        'login_ip': os.getenv('AUTH_THROTTLE_LOGIN_IP', '30/min'),
+        'login_email': os.getenv('AUTH_THROTTLE_LOGIN_EMAIL', '10/min'),
+        'register_ip': os.getenv('AUTH_THROTTLE_REGISTER_IP', '20/hour'),
+        'register_email': os.getenv('AUTH_THROTTLE_REGISTER_EMAIL', '5/hour'),
+    },
+}
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/6.0/topics/i18n/
@@ -135,7 +363,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -147,8 +375,12 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.tokens.CachedBlacklistTokenRefreshSerializer',
 }
 
+# Blacklisted refresh-token jtis remembered per process (accounts.tokens)
+TOKEN_BLACKLIST_LRU_SIZE = int(os.getenv('TOKEN_BLACKLIST_LRU_SIZE', 50000))
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -158,6 +390,34 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Sampling profiler for slow requests (yourkirana.profiling); view at /admin/profiles/
+REQUEST_PROFILING = {
+    'ENABLED': os.getenv('REQUEST_PROFILING', 'False') == 'True',
+    'SAMPLE_RATE': float(os.getenv('REQUEST_PROFILING_SAMPLE_RATE', 0.01)),
+    'SLOW_MS': float(os.getenv('REQUEST_PROFILING_SLOW_MS', 500)),
+    'PATH_PREFIXES': ('/api/payment/', '/api/auth/'),
+    'DIR': os.getenv('REQUEST_PROFILING_DIR', str(BASE_DIR / 'profiles')),
+    'MAX_PROFILES': 200,
+}
+
+# Bearer token the Prometheus scraper sends to /metrics. Unset, /metrics
+# answers 404 (except with DEBUG).
+METRICS_AUTH_TOKEN = os.getenv('METRICS_AUTH_TOKEN')
+
+# "sync": process PayG webhooks inside the request.
+# "queue": store the raw webhook, ack immediately, and let
+# `manage.py process_webhooks` apply it in the background.
+PAYMENT_WEBHOOK_MODE = os.getenv('PAYMENT_WEBHOOK_MODE', 'sync')
+
+# Where `manage.py archive_payment_data` writes its monthly .jsonl.gz parts
+PAYMENT_ARCHIVE_DIR = os.getenv('PAYMENT_ARCHIVE_DIR', str(BASE_DIR / 'archive'))
+
+# `manage.py reconcile_payments`: PENDING/PROCESSING payments untouched for
+# this long are looked up at PayG in case their webhook was lost
+PAYMENT_RECONCILE_STALE_MINUTES = int(os.getenv('PAYMENT_RECONCILE_STALE_MINUTES', 15))
+
+PAYG_BASE_URL = os.getenv('PAYG_BASE_URL', 'https://apiv2.payg.in')
+
 PAYG_CONFIG = {
     'MERCHANT_KEY_ID': os.getenv('PAYG_MERCHANT_KEY_ID'),
     'MID': os.getenv('PAYG_MID'),
@@ -165,9 +425,25 @@ PAYG_CONFIG = {
     'AUTHENTICATION_TOKEN': os.getenv('PAYG_AUTHENTICATION_TOKEN'),
     'SECURE_HASH_KEY': os.getenv('PAYG_SECURE_HASH_KEY'),
     'ENCRYPTION_KEY': os.getenv('PAYG_ENCRYPTION_KEY'),
-    # Production URL
-    'PAYMENT_URL': 'https://apiv2.payg.in/payment/api/order/create',
+    # Production URL (PAYG_BASE_URL=http://127.0.0.1:8765 for `manage.py payg_simulator`)
+    'PAYMENT_URL': f"{PAYG_BASE_URL}/payment/api/order/create",
+    'ORDER_STATUS_URL': f"{PAYG_BASE_URL}/payment/api/order/Detail",
     'CALLBACK_URL': 'https://yourkirana.in/cart',
     'RETURN_URL': 'https://yourkirana.in/cart',
+    # Shared keep-alive HTTP pool (per worker process)
+    'POOL_SIZE': int(os.getenv('PAYG_POOL_SIZE', 10)),
+    'CONNECT_TIMEOUT': float(os.getenv('PAYG_CONNECT_TIMEOUT', 5)),
+    'READ_TIMEOUT': float(os.getenv('PAYG_READ_TIMEOUT', 30)),
+    # Retries (same UniqueRequestId) for connection errors and 429/502/503/504
+    'MAX_RETRIES': int(os.getenv('PAYG_MAX_RETRIES', 2)),
+    'RETRY_BACKOFF': 0.2,
+    'RETRY_BUDGET_RATIO': 0.2,
+    # Circuit breakers (one for order create, one for order status lookups):
+    # open when >= 50% of the last 20 calls failed or were slow
+    'BREAKER_FAILURE_RATE': 0.5,
+    'BREAKER_SLOW_CALL_SECONDS': 5,
+    'BREAKER_WINDOW': 20,
+    'BREAKER_MIN_CALLS': 10,
+    'BREAKER_RESET_TIMEOUT': 30,
 }
 
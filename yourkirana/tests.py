@@ -0,0 +1,290 @@
+import io
+import json
+import logging
+import tempfile
+import uuid
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections, router
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from prometheus_client import REGISTRY
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.authentication import user_cache
+from accounts.models import User
+from payments.models import Payment
+
+from .db_router import REPLICA_DB_ALIAS, mark_write, replica_reads
+from .log import REDACTED, AsyncStreamHandler
+from .profiling import list_profile_files
+
+
+class JsonLoggingRedactionTests(SimpleTestCase):
+    """Secrets in structured extra fields never reach the JSON log output"""
+
+    def setUp(self):
+        self.stream = io.StringIO()
+        self.handler = AsyncStreamHandler(stream=self.stream)
+        self.logger = logging.getLogger('yourkirana.tests.redaction')
+        self.logger.addHandler(self.handler)
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.addCleanup(self.logger.removeHandler, self.handler)
+
+    def entries(self):
+        # Stops the listener thread after it has written everything queued
+        self.handler.close()
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_nested_payloads(self):
+        self.logger.info("payg.request", extra={
+            "order_id": "YK1",
+            "headers": {"Authorization": "Basic abc", "Content-Type": "application/json"},
+            "payload": {
+                "OrderAmount": 10,
+                "CardDetails": {"number": "4111111111111111"},
+                "Customer": {"Password": "hunter2", "name": "A"},
+                "attempts": [{"refresh_token": "eyJ...", "cvv": "cvv-7q7", "status": 1}],
+            },
+        })
+        [entry] = self.entries()
+        self.assertEqual(entry["event"], "payg.request")
+        self.assertEqual(entry["order_id"], "YK1")
+        self.assertEqual(entry["headers"], {"Authorization": REDACTED, "Content-Type": "application/json"})
+        payload = entry["payload"]
+        self.assertEqual(payload["OrderAmount"], 10)
+        self.assertEqual(payload["CardDetails"], REDACTED)
+        self.assertEqual(payload["Customer"], {"Password": REDACTED, "name": "A"})
+        self.assertEqual(payload["attempts"], [{"refresh_token": REDACTED, "cvv": REDACTED, "status": 1}])
+        for secret in ("Basic abc", "4111111111111111", "hunter2", "eyJ", "cvv-7q7"):
+            self.assertNotIn(secret, self.stream.getvalue())
+
+    def test_top_level_extra_keys(self):
+        self.logger.info("auth.login", extra={"access_token": "eyJ...", "card_number": "4111", "user_id": 7})
+        [entry] = self.entries()
+        self.assertEqual((entry["access_token"], entry["card_number"], entry["user_id"]), (REDACTED, REDACTED, 7))
+
+    def test_message_args_and_exception_are_rendered(self):
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            self.logger.exception("webhook.failed %s", "YK1")
+        [entry] = self.entries()
+        self.assertEqual(entry["event"], "webhook.failed YK1")
+        self.assertIn("ValueError: boom", entry["exc"])
+
+
+
+class ReplicaRouterTests(TransactionTestCase):
+    """Reads go to a second SQLite file only inside replica_reads(), never after the user's own write"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        # Added after the runner set up the test databases, so the file is used
+        # as is. connections.settings is settings.DATABASES: replica_configured()
+        # sees it too.
+        connections.settings[REPLICA_DB_ALIAS] = {
+            **connections.settings[DEFAULT_DB_ALIAS],
+            'NAME': str(Path(cls.tmp.name) / 'replica.sqlite3'),
+        }
+        cls.databases = {DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS}
+        super().setUpClass()
+        # The replica's copy of the schema (migrate leaves the replica alone),
+        # lagging behind: it has the user, but not the primary's payment. flush
+        # skips the replica too, so this is set up once.
+        with connections[REPLICA_DB_ALIAS].schema_editor() as editor:
+            editor.create_model(User)
+            editor.create_model(Payment)
+        cls.user_id = uuid.uuid4()
+        User.objects.using(REPLICA_DB_ALIAS).create(pk=cls.user_id, email='router@yourkirana.in', full_name='Router')
+        cls.payment('YKREPLICA', using=REPLICA_DB_ALIAS)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA_DB_ALIAS].close()
+        del connections[REPLICA_DB_ALIAS]
+        del connections.settings[REPLICA_DB_ALIAS]
+        cls.tmp.cleanup()
+
+    def setUp(self):
+        self.addCleanup(caches[settings.REPLICA_STICKY_CACHE_ALIAS].clear)
+        User.objects.create(pk=self.user_id, email='router@yourkirana.in', full_name='Router')
+        self.payment('YKPRIMARY')
+
+    @classmethod
+    def payment(cls, order_id, using=DEFAULT_DB_ALIAS):
+        return Payment.objects.using(using).create(
+            user_id=cls.user_id, order_id=order_id, amount=Decimal('10'),
+            customer_name='A', customer_email='a@a.in', customer_phone='1',
+        )
+
+    def order_ids(self):
+        return list(Payment.objects.values_list('order_id', flat=True))
+
+    def test_reads_use_replica_only_inside_block(self):
+        with replica_reads(self.user_id):
+            self.assertEqual(self.order_ids(), ['YKREPLICA'])
+        self.assertEqual(self.order_ids(), ['YKPRIMARY'])
+
+    def test_writes_go_to_primary(self):
+        with replica_reads(self.user_id):
+            created = Payment.objects.create(
+                user_id=self.user_id, order_id='YKWRITE', amount=Decimal('10'),
+                customer_name='A', customer_email='a@a.in', customer_phone='1',
+            )
+            Payment.objects.filter(order_id='YKPRIMARY').update(status='SUCCESS')
+        self.assertEqual(created._state.db, DEFAULT_DB_ALIAS)
+        self.assertEqual(Payment.objects.get(order_id='YKPRIMARY').status, 'SUCCESS')
+        self.assertFalse(Payment.objects.using(REPLICA_DB_ALIAS).filter(order_id='YKWRITE').exists())
+
+    def test_reads_stick_to_primary_after_own_write(self):
+        mark_write(self.user_id)
+        with replica_reads(self.user_id):
+            self.assertEqual(self.order_ids(), ['YKPRIMARY'])
+        # Only the writer is pinned
+        with replica_reads(uuid.uuid4()):
+            self.assertEqual(self.order_ids(), ['YKREPLICA'])
+
+    def test_migrate_leaves_replica_alone(self):
+        replica = connections[REPLICA_DB_ALIAS]
+        before = set(replica.introspection.table_names())
+        call_command('migrate', database=REPLICA_DB_ALIAS, verbosity=0)
+        # Only the migration recorder's bookkeeping table
+        self.assertLessEqual(set(replica.introspection.table_names()) - before, {'django_migrations'})
+        self.assertFalse(router.allow_migrate(REPLICA_DB_ALIAS, 'payments', model_name='payment'))
+
+
+class MetricsTests(TestCase):
+    """MetricsMiddleware times requests and counts their queries on both handlers; /metrics needs the token"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='metrics@yourkirana.in', full_name='Metrics User', password='x')
+        self.auth = {'Authorization': f"Bearer {AccessToken.for_user(self.user)}"}
+        self.addCleanup(user_cache().clear)
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def history_samples(self):
+        return (
+            self.sample('http_request_duration_seconds_count', view='payment_history', method='GET', status='200'),
+            self.sample('http_request_db_queries_sum', view='payment_history'),
+        )
+
+    def test_sync_request(self):
+        requests_before, queries_before = self.history_samples()
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get('/api/payment/history/', headers=self.auth).status_code, 200)
+        requests_after, queries_after = self.history_samples()
+        self.assertEqual(requests_after - requests_before, 1)
+        self.assertEqual(queries_after - queries_before, len(ctx.captured_queries))
+
+    async def test_async_request(self):
+        requests_before, queries_before = self.history_samples()
+        response = await self.async_client.get('/api/payment/history/', headers=self.auth)
+        self.assertEqual(response.status_code, 200)
+        requests_after, queries_after = self.history_samples()
+        self.assertEqual(requests_after - requests_before, 1)
+        # User lookup and the page, run in the sync thread: still this request's
+        self.assertGreaterEqual(queries_after - queries_before, 2)
+
+    def test_unresolved_paths_share_one_label(self):
+        before = self.sample('http_request_duration_seconds_count', view='unresolved', method='GET', status='404')
+        self.client.get('/no/such/path/')
+        self.client.get('/another/missing/path/')
+        after = self.sample('http_request_duration_seconds_count', view='unresolved', method='GET', status='404')
+        self.assertEqual(after - before, 2)
+
+    def test_metrics_endpoint_needs_token(self):
+        with override_settings(METRICS_AUTH_TOKEN=None):
+            self.assertEqual(self.client.get('/metrics').status_code, 404)
+            with override_settings(DEBUG=True):
+                self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+        with override_settings(METRICS_AUTH_TOKEN='scrape-secret'):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-secret')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b'http_request_duration_seconds', response.content)
+
+
+class RequestProfilingTests(TestCase):
+    """Sampled slow requests are saved (as a ring buffer) only when enabled, and listed to staff"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.user = User.objects.create_user(email='profile@yourkirana.in', full_name='Profile User', password='x')
+        self.auth = {'Authorization': f"Bearer {AccessToken.for_user(self.user)}"}
+        self.addCleanup(user_cache().clear)
+
+    def profiling(self, **config):
+        return override_settings(REQUEST_PROFILING={
+            **settings.REQUEST_PROFILING,
+            'ENABLED': True,
+            'SAMPLE_RATE': 1.0,
+            'SLOW_MS': 0,
+            'DIR': str(self.dir),
+            **config,
+        })
+
+    def history(self):
+        self.assertEqual(self.client.get('/api/payment/history/', headers=self.auth).status_code, 200)
+
+    def profiles(self):
+        return [json.loads(path.read_text()) for path in list_profile_files(self.dir)]
+
+    def test_disabled_does_nothing(self):
+        with self.profiling(ENABLED=False), mock.patch('cProfile.Profile') as profile:
+            self.history()
+        profile.assert_not_called()
+        self.assertEqual(list(self.dir.iterdir()), [])
+
+    def test_slow_request_is_saved(self):
+        with self.profiling():
+            self.history()
+        [profile] = self.profiles()
+        self.assertEqual((profile['path'], profile['view'], profile['status']), ('/api/payment/history/', 'payment_history', 200))
+        self.assertTrue(any('payments_payment' in query['sql'] for query in profile['sql']))
+        self.assertIn('cumulative', profile['stats'])
+
+    def test_fast_and_unlisted_requests_are_dropped(self):
+        with self.profiling(SLOW_MS=60_000):
+            self.history()
+        with self.profiling(PATH_PREFIXES=('/api/auth/',)):
+            self.history()
+        self.assertEqual(self.profiles(), [])
+
+    def test_keeps_newest_max_profiles(self):
+        with self.profiling(MAX_PROFILES=2):
+            for _ in range(3):
+                self.history()
+        self.assertEqual(len(self.profiles()), 2)
+
+    def test_admin_page_is_staff_only(self):
+        with self.profiling():
+            self.history()
+            [profile] = self.profiles()
+            detail = f"/admin/profiles/{profile['id']}/"
+
+            for path in ('/admin/profiles/', detail):
+                self.assertEqual(self.client.get(path).status_code, 302)
+            self.client.force_login(self.user)
+            self.assertEqual(self.client.get('/admin/profiles/').status_code, 302)
+
+            self.user.is_staff = True
+            self.user.save(update_fields=['is_staff'])
+            response = self.client.get('/admin/profiles/')
+            self.assertContains(response, '/api/payment/history/')
+            self.assertContains(self.client.get(detail), 'payments_payment')
+            self.assertEqual(self.client.get('/admin/profiles/no-such-profile/').status_code, 404)
@@ -17,8 +17,14 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from .metrics import metrics_view
+from .profiling import profiles_view
+
 urlpatterns = [
+    path('admin/profiles/', admin.site.admin_view(profiles_view), name='request_profiles'),
+    path('admin/profiles/<str:profile_id>/', admin.site.admin_view(profiles_view), name='request_profile'),
     path('admin/', admin.site.urls),
     path('api/auth/', include('accounts.urls')),
     path('api/payment/', include('payments.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]